@@ -0,0 +1,94 @@
+"""Latency under overload with and without admission control.
+
+A stand-in app takes --service-ms per request with at most --capacity
+requests making progress at once, like a pool of Argon2 threads or database
+connections. --clients closed-loop clients send login-class requests
+through `AdmissionMiddleware` for --seconds, once with admission disabled
+(an unlimited class limit and queue) and once with the configured limits.
+The report has the latency of served requests, how many were shed, and the
+time shed requests took to be told.
+
+    SECRET_KEY=... python -m benchmarks.admission --clients 200 --capacity 4
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import summarize_ms
+from config import settings
+from core.admission import AdmissionMiddleware, Limiter
+
+UNLIMITED = 1_000_000
+
+
+def backend(capacity: int, service_seconds: float):
+    slots = asyncio.Semaphore(capacity)
+
+    async def app(scope, receive, send) -> None:
+        async with slots:
+            await asyncio.sleep(service_seconds)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return app
+
+
+async def run(args: argparse.Namespace, limited: bool) -> dict:
+    middleware = AdmissionMiddleware(backend(args.capacity, args.service_ms / 1000))
+    if not limited:
+        middleware.global_limiter = Limiter("global", UNLIMITED, UNLIMITED)
+        middleware.class_limiters["login"] = Limiter("login", UNLIMITED, UNLIMITED)
+    scope = {"type": "http", "method": "POST", "path": "/api/users/token", "headers": []}
+    served: list[float] = []
+    shed: list[float] = []
+    stop = time.perf_counter() + args.seconds
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def client() -> None:
+        while time.perf_counter() < stop:
+            statuses = []
+
+            async def send(message) -> None:
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            started = time.perf_counter()
+            await middleware(scope, receive, send)
+            elapsed = time.perf_counter() - started
+            if statuses[0] == 503:
+                shed.append(elapsed)
+                await asyncio.sleep(settings.admission_retry_after)
+            else:
+                served.append(elapsed)
+
+    await asyncio.gather(*(client() for _ in range(args.clients)))
+    return {
+        "served": len(served),
+        "shed": len(shed),
+        "served_ms": summarize_ms(served),
+        "shed_ms": summarize_ms(shed),
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    return {
+        "unlimited": await run(args, limited=False),
+        "admission": await run(args, limited=True),
+        "limits": {
+            "login": settings.admission_login_limit,
+            "queue_size": settings.admission_queue_size,
+            "queue_timeout": settings.admission_queue_timeout,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--service-ms", type=float, default=50.0)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
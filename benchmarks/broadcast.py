@@ -0,0 +1,99 @@
+"""Fan-out cost of the live feed broadcaster at --subscribers connections.
+
+Each subscriber is a task draining its `Subscription.frames()` the way the
+SSE response does, without a socket. For every event the report has the
+time `publish` blocks the event loop (encoding plus one `put_nowait` per
+subscriber) and the time until the last subscriber has received it. A
+second run leaves --slow of the subscribers stalled to measure how slow
+consumers are dropped once their queues fill up.
+
+    python -m benchmarks.broadcast --subscribers 10000 --events 200
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import summarize_ms
+from core.broadcast import Broadcaster
+from schemas import PostEvent
+
+
+def event_data(i: int) -> str:
+    return PostEvent(
+        id=i, user_id=1, title=f"Post {i}", excerpt="Lorem ipsum dolor sit amet. " * 10
+    ).model_dump_json()
+
+
+async def run(subscribers: int, events: int, slow: int) -> dict:
+    broadcaster = Broadcaster(history_size=1000, max_subscribers=subscribers)
+    received = 0
+    all_received = asyncio.Event()
+    target = 0
+
+    async def consume(subscription, stalled: bool) -> None:
+        nonlocal received
+        frames = subscription.frames()
+        await anext(frames)  # retry: preamble
+        if stalled:
+            await asyncio.sleep(3600)
+        async for _ in frames:
+            received += 1
+            if received == target:
+                all_received.set()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    subscriptions = [broadcaster.subscribe() for _ in range(subscribers)]
+    tasks = [
+        asyncio.create_task(consume(subscription, i < slow))
+        for i, subscription in enumerate(subscriptions)
+    ]
+    await asyncio.sleep(0)
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - baseline) / subscribers
+    tracemalloc.stop()
+
+    publish_times, delivery_times = [], []
+    for i in range(events):
+        # Stalled subscribers never receive anything; the rest get every event
+        target = received + subscribers - slow
+        all_received.clear()
+        started = time.perf_counter()
+        broadcaster.publish("post.created", event_data(i))
+        publish_times.append(time.perf_counter() - started)
+        await all_received.wait()
+        delivery_times.append(time.perf_counter() - started)
+
+    report = {
+        "subscribers": subscribers,
+        "slow": slow,
+        "bytes_per_subscriber": round(per_subscriber),
+        "publish_ms": summarize_ms(publish_times),
+        "delivered_ms": summarize_ms(delivery_times),
+        "dropped": broadcaster.dropped,
+    }
+    await broadcaster.close()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return report
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    from config import settings
+
+    settings.sse_queue_size = args.queue_size
+    return [
+        await run(args.subscribers, args.events, 0),
+        await run(args.subscribers, args.events, args.slow),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--slow", type=int, default=100, help="stalled subscribers in the second run")
+    parser.add_argument("--queue-size", type=int, default=64)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,105 @@
+"""Posts per second: one POST /api/posts per post vs. POST /api/posts/bulk.
+
+Runs the app in-process against a temporary SQLite file and imports the
+same --posts posts three ways: individually, as JSON arrays of --batch
+items and as NDJSON bodies of --batch lines.
+
+    SECRET_KEY=... python -m benchmarks.bulk_import --posts 10000 --batch 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+def post_items(count: int, prefix: str) -> list[dict]:
+    return [
+        {"title": f"{prefix} {i}", "content": f"Imported post {i}. " + "Lorem ipsum dolor sit amet. " * 20}
+        for i in range(count)
+    ]
+
+
+async def single(client, headers: dict, items: list[dict], concurrency: int) -> int:
+    created = 0
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal created, next_index
+        while next_index < len(items):
+            item = items[next_index]
+            next_index += 1
+            response = await client.post("/api/posts", json=item, headers=headers)
+            created += response.status_code == 201
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return created
+
+
+async def bulk_json(client, headers: dict, items: list[dict], batch: int) -> int:
+    created = 0
+    for start in range(0, len(items), batch):
+        response = await client.post("/api/posts/bulk", json=items[start:start + batch], headers=headers)
+        created += response.json()["created"]
+    return created
+
+
+async def bulk_ndjson(client, headers: dict, items: list[dict], batch: int) -> int:
+    created = 0
+    for start in range(0, len(items), batch):
+        body = "\n".join(json.dumps(item) for item in items[start:start + batch])
+        response = await client.post(
+            "/api/posts/bulk",
+            content=body,
+            headers={**headers, "Content-Type": "application/x-ndjson"},
+        )
+        created += response.json()["created"]
+    return created
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(tmp) / 'bulk.db'}"
+
+        import httpx
+
+        from main import app
+
+        report = {"posts": args.posts, "batch": args.batch}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                await client.post("/api/users", json={
+                    "username": "importer", "email": "importer@example.com", "password": "benchmark-password",
+                })
+                token = (await client.post("/api/users/token", data={
+                    "username": "importer@example.com", "password": "benchmark-password",
+                })).json()["access_token"]
+                headers = {"Authorization": f"Bearer {token}"}
+
+                for name, run in (
+                    ("single", lambda items: single(client, headers, items, args.concurrency)),
+                    ("bulk_json", lambda items: bulk_json(client, headers, items, args.batch)),
+                    ("bulk_ndjson", lambda items: bulk_ndjson(client, headers, items, args.batch)),
+                ):
+                    items = post_items(args.posts, name)
+                    started = time.perf_counter()
+                    created = await run(items)
+                    seconds = time.perf_counter() - started
+                    report[name] = {
+                        "created": created,
+                        "seconds": round(seconds, 2),
+                        "posts_per_second": round(created / seconds, 1),
+                    }
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="concurrent clients for the one-request-per-post run")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,20 @@
+import statistics
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def summarize_ms(samples: list[float]) -> dict[str, float]:
+    """Latency summary in milliseconds for samples given in seconds."""
+    return {
+        "mean": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50": round(percentile(samples, 50) * 1000, 3),
+        "p95": round(percentile(samples, 95) * 1000, 3),
+        "p99": round(percentile(samples, 99) * 1000, 3),
+        "max": round(max(samples, default=0.0) * 1000, 3),
+    }
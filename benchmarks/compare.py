@@ -0,0 +1,40 @@
+"""Compare two reports written by `benchmarks.run`.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def compare(before: dict, after: dict) -> list[str]:
+    lines = [f"{'scenario':28} {'rps before':>11} {'rps after':>10} {'change':>8} "
+             f"{'p99 before':>11} {'p99 after':>10} {'change':>8}"]
+    for name in sorted(before["scenarios"].keys() | after["scenarios"].keys()):
+        old = before["scenarios"].get(name)
+        new = after["scenarios"].get(name)
+        if old is None or new is None:
+            lines.append(f"{name:28} {'only in ' + ('after' if old is None else 'before'):>11}")
+            continue
+        old_p99, new_p99 = old["latency_ms"]["p99"], new["latency_ms"]["p99"]
+        lines.append(
+            f"{name:28} {old['throughput_rps']:>11} {new['throughput_rps']:>10} "
+            f"{change(old['throughput_rps'], new['throughput_rps']):>8} "
+            f"{old_p99:>11} {new_p99:>10} {change(old_p99, new_p99):>8}"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    args = parser.parse_args()
+    report = compare(json.loads(args.before.read_text()), json.loads(args.after.read_text()))
+    print("\n".join(report))
@@ -0,0 +1,116 @@
+"""Deterministic synthetic dataset for benchmarks.
+
+The same --seed, --users and --posts always produce the same rows, so runs
+at a given scale are comparable across commits.
+
+    SECRET_KEY=... python -m benchmarks.dataset /tmp/bench.db --users 1000 --posts 100000
+"""
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import insert
+
+import models
+from core.migrations import stamp
+from core.search import create_search_index
+from core.security import hash_password
+from database import Base, make_engine, sqlite_pragmas
+
+BENCH_PASSWORD = "benchmark-password"
+BATCH_SIZE = 10_000
+START = datetime(2020, 1, 1, tzinfo=UTC)
+
+WORDS = (
+    "async api blog cache cursor database endpoint engine event fastapi feed "
+    "index jinja json latency loop middleware page pool post python query "
+    "request response route schema server session sqlite static template "
+    "token user worker write read stream batch commit session index vector"
+).split()
+
+
+@dataclass(frozen=True)
+class DatasetInfo:
+    users: int
+    posts: int
+    seed: int
+    password: str = BENCH_PASSWORD
+
+
+def sqlite_url(path: str) -> str:
+    return f"sqlite+aiosqlite:///{path}"
+
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def user_rows(count: int, password_hash: str, first_id: int = 1) -> list[dict]:
+    return [
+        {
+            "id": user_id,
+            "username": f"user{user_id}",
+            "email": f"user{user_id}@example.com",
+            "password_hash": password_hash,
+            "image_file": None,
+        }
+        for user_id in range(first_id, first_id + count)
+    ]
+
+
+def post_rows(rng: random.Random, first_id: int, count: int, users: int) -> list[dict]:
+    rows = []
+    for post_id in range(first_id, first_id + count):
+        # Spread posts a minute apart with jitter so (date_posted, id) ties
+        # are rare but possible, as in real data
+        posted = START + timedelta(minutes=post_id, seconds=rng.randint(0, 59))
+        rows.append({
+            "id": post_id,
+            "title": _sentence(rng, 3, 8)[:100],
+            "content": "\n\n".join(_sentence(rng, 20, 60) + "." for _ in range(rng.randint(1, 4))),
+            "user_id": rng.randint(1, users),
+            "date_posted": posted,
+            "updated_at": posted,
+        })
+    return rows
+
+
+async def generate(url: str, users: int, posts: int, seed: int = 0) -> DatasetInfo:
+    """Create the schema at `url` and fill it with `users` users and `posts` posts.
+
+    Every user shares the password BENCH_PASSWORD; it is hashed once.
+    """
+    rng = random.Random(seed)
+    engine = make_engine(url, pool_size=1, max_overflow=0, pragmas=sqlite_pragmas())
+    password_hash = hash_password(BENCH_PASSWORD)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for first in range(1, users + 1, BATCH_SIZE):
+                count = min(BATCH_SIZE, users - first + 1)
+                await conn.execute(insert(models.User), user_rows(count, password_hash, first))
+            for first in range(1, posts + 1, BATCH_SIZE):
+                count = min(BATCH_SIZE, posts - first + 1)
+                await conn.execute(insert(models.Post), post_rows(rng, first, count, users))
+            # Built once after the bulk insert: a single FTS5 rebuild is far
+            # cheaper than the per-row triggers would have been
+            await conn.run_sync(create_search_index)
+            await conn.run_sync(stamp)
+    finally:
+        await engine.dispose()
+    return DatasetInfo(users=users, posts=posts, seed=seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="SQLite file to create")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    asyncio.run(generate(sqlite_url(args.path), args.users, args.posts, args.seed))
+    print(f"Generated {args.users} users and {args.posts} posts in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,78 @@
+"""Event-loop latency seen by readers while a login storm verifies passwords.
+
+Compares verifying Argon2 hashes inline on the event loop (the old
+behaviour) with handing them to `core.security.password_executor`.
+
+    SECRET_KEY=... python -m benchmarks.password_hashing --logins 200 --readers 50
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import summarize_ms
+from core.security import (
+    hash_password,
+    password_executor,
+    verify_password,
+    verify_password_async,
+)
+
+TICK = 0.005
+
+
+async def reader(lags: list[float], stop: asyncio.Event) -> None:
+    # A reader that wants the loop every TICK seconds; any extra delay is
+    # time the loop spent blocked by someone else.
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+
+async def storm(mode: str, hashed: str, logins: int, concurrency: int, readers: int) -> dict:
+    lags: list[float] = []
+    stop = asyncio.Event()
+    reader_tasks = [asyncio.create_task(reader(lags, stop)) for _ in range(readers)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login() -> None:
+        async with semaphore:
+            if mode == "inline":
+                verify_password("correct horse battery", hashed)
+                await asyncio.sleep(0)
+            else:
+                await verify_password_async("correct horse battery", hashed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*reader_tasks)
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "logins_per_second": round(logins / elapsed, 1),
+        "reader_samples": len(lags),
+        "loop_lag_ms": summarize_ms(lags),
+    }
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    hashed = hash_password("correct horse battery")
+    results = []
+    for mode in ("inline", "executor"):
+        results.append(
+            await storm(mode, hashed, args.logins, args.concurrency, args.readers)
+        )
+    password_executor.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=50)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,103 @@
+"""Cost of a rate limit check, and whether limits hold across workers.
+
+The first part times --checks `RateLimit.check` calls against each store,
+spread over --clients keys, and reports microseconds per check.
+
+The second part starts --workers processes at once, each making --attempts
+requests against one bucket of --capacity tokens (with a negligible refill),
+and reports how many were allowed in total: per-process memory stores allow
+up to workers * capacity, the shared SQLite store only capacity.
+
+    SECRET_KEY=... python -m benchmarks.ratelimit --checks 100000 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi import HTTPException
+
+import core.ratelimit
+from core.ratelimit import MemoryStore, RateLimit, SQLiteStore
+
+LIMIT = RateLimit("bench", limit=1_000_000, period=1)
+
+
+def make_store(kind: str, path: str) -> MemoryStore | SQLiteStore:
+    return MemoryStore(maxsize=100_000) if kind == "memory" else SQLiteStore(path)
+
+
+async def overhead(store: MemoryStore | SQLiteStore, checks: int, clients: int) -> dict:
+    core.ratelimit.rate_limit_store = store
+    try:
+        started = time.perf_counter()
+        for i in range(checks):
+            await LIMIT.check(f"ip:10.0.{i % clients // 256}.{i % 256}")
+        elapsed = time.perf_counter() - started
+    finally:
+        store.close()
+    return {"checks": checks, "us_per_check": round(elapsed / checks * 1e6, 2)}
+
+
+async def attempt(kind: str, path: str, capacity: int, attempts: int) -> int:
+    core.ratelimit.rate_limit_store = make_store(kind, path)
+    limit = RateLimit("shared", limit=capacity, period=1e9)
+    allowed = 0
+    try:
+        for _ in range(attempts):
+            try:
+                await limit.check("ip:203.0.113.1")
+                allowed += 1
+            except HTTPException:
+                pass
+    finally:
+        core.ratelimit.rate_limit_store.close()
+    return allowed
+
+
+def across_workers(kind: str, path: str, args: argparse.Namespace) -> dict:
+    processes = [
+        subprocess.Popen(
+            [
+                sys.executable, "-m", "benchmarks.ratelimit", "--worker", kind, "--path", path,
+                "--capacity", str(args.capacity), "--attempts", str(args.attempts),
+            ],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        for _ in range(args.workers)
+    ]
+    allowed = sum(int(process.communicate()[0]) for process in processes)
+    return {"workers": args.workers, "capacity": args.capacity, "allowed": allowed}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {"overhead": {}, "across_workers": {}}
+        for kind in ("memory", "sqlite"):
+            report["overhead"][kind] = await overhead(
+                make_store(kind, str(Path(tmp) / "overhead.db")), args.checks, args.clients
+            )
+        for kind in ("memory", "sqlite"):
+            report["across_workers"][kind] = across_workers(kind, str(Path(tmp) / "shared.db"), args)
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--checks", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--attempts", type=int, default=500)
+    parser.add_argument("--worker", choices=["memory", "sqlite"], help=argparse.SUPPRESS)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(asyncio.run(attempt(args.worker, args.path, args.capacity, args.attempts)))
+    else:
+        print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,335 @@
+"""Drive every route of the app in-process and report throughput and latency.
+
+A synthetic dataset is generated into a temporary SQLite file, the app is
+started against it through its lifespan, and each scenario is replayed
+through httpx's ASGI transport at the requested concurrency. Results go to a
+JSON file with stable keys, so two runs can be compared with
+`python -m benchmarks.compare`.
+
+    SECRET_KEY=... python -m benchmarks.run --posts 100000 --users 1000 \\
+        --concurrency 32 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.common import summarize_ms
+
+
+@dataclass
+class Scenario:
+    """One route exercised `iterations` times.
+
+    `build(i)` returns the keyword arguments for `httpx.AsyncClient.request`
+    of the i-th request (at least "url"); any status other than `expect`
+    counts as an error.
+    """
+    name: str
+    method: str
+    route: str
+    build: Callable[[int], dict]
+    iterations: int
+    expect: int = 200
+
+
+# Routes the suite deliberately does not drive, with the reason
+SKIPPED = {
+    ("POST", "/posts"): "renders create_post.html, which does not exist",
+    ("GET", "/api/posts/stream"): "never-ending event stream; measured by benchmarks.broadcast",
+}
+
+
+SEARCH_TERMS = ("python", "cache latency", "sqlite cursor stream", "nonexistentword")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_scenarios(args: argparse.Namespace, context: dict) -> list[Scenario]:
+    from core.pagination import encode_cursor
+
+    users, posts = args.users, args.posts
+    n, slow = args.requests, args.auth_requests
+    auth = {"Authorization": f"Bearer {context['token']}"}
+    own_posts = context["own_posts"]
+    deep = context["deep_post"]
+    deep_cursor = encode_cursor(deep["date_posted"], deep["id"])
+
+    def post_id(i: int) -> int:
+        return (i * 7919) % posts + 1
+
+    def user_id(i: int) -> int:
+        return (i * 104729) % users + 1
+
+    def own(i: int) -> int:
+        return own_posts[i % len(own_posts)]
+
+    return [
+        # JSON API: posts
+        Scenario("api_posts_first_page", "GET", "/api/posts",
+                 lambda i: {"url": "/api/posts"}, n),
+        Scenario("api_posts_summary", "GET", "/api/posts",
+                 lambda i: {"url": "/api/posts?view=summary"}, n),
+        Scenario("api_posts_deep_page", "GET", "/api/posts",
+                 lambda i: {"url": f"/api/posts?cursor={deep_cursor}"}, n),
+        Scenario("api_post_detail", "GET", "/api/posts/{post_id}",
+                 lambda i: {"url": f"/api/posts/{post_id(i)}"}, n),
+        Scenario("api_search_posts", "GET", "/api/posts/search",
+                 lambda i: {"url": "/api/posts/search",
+                            "params": {"q": SEARCH_TERMS[i % len(SEARCH_TERMS)]}}, n),
+        Scenario("api_create_post", "POST", "/api/posts",
+                 lambda i: {"url": "/api/posts", "headers": auth,
+                            "json": {"title": f"Bench {i}", "content": "Benchmark body. " * 40}},
+                 n, expect=201),
+        Scenario("api_create_posts_bulk", "POST", "/api/posts/bulk",
+                 lambda i: {"url": "/api/posts/bulk", "headers": auth,
+                            "json": [{"title": f"Bulk {i}.{j}", "content": "Imported body. " * 40}
+                                     for j in range(100)]},
+                 max(1, n // 10), expect=201),
+        Scenario("api_update_post_full", "PUT", "/api/posts/{post_id}",
+                 lambda i: {"url": f"/api/posts/{own(i)}", "headers": auth,
+                            "json": {"title": f"Put {i}", "content": "Replaced body. " * 40}}, n),
+        Scenario("api_update_post_partial", "PATCH", "/api/posts/{post_id}",
+                 lambda i: {"url": f"/api/posts/{own(i)}", "headers": auth,
+                            "json": {"title": f"Patch {i}"}}, n),
+        Scenario("api_delete_post", "DELETE", "/api/posts/{post_id}",
+                 lambda i: {"url": f"/api/posts/{context['disposable_posts'][i]}", "headers": auth},
+                 n, expect=204),
+        # JSON API: export (whole corpus per request, so far fewer iterations)
+        Scenario("api_export_posts", "GET", "/api/export/posts",
+                 lambda i: {"url": "/api/export/posts", "params": {"gzip": i % 2 == 1}},
+                 max(1, n // 50)),
+        Scenario("api_export_users", "GET", "/api/export/users",
+                 lambda i: {"url": "/api/export/users"}, max(1, n // 50)),
+        # JSON API: users
+        Scenario("api_create_user", "POST", "/api/users",
+                 lambda i: {"url": "/api/users",
+                            "json": {"username": f"signup{i}", "email": f"signup{i}@example.com",
+                                     "password": "benchmark-password"}},
+                 slow, expect=201),
+        Scenario("api_login", "POST", "/api/users/token",
+                 lambda i: {"url": "/api/users/token",
+                            "data": {"username": f"user{user_id(i)}@example.com",
+                                     "password": context["password"]}}, slow),
+        Scenario("api_me", "GET", "/api/users/me",
+                 lambda i: {"url": "/api/users/me", "headers": auth}, n),
+        Scenario("api_user_detail", "GET", "/api/users/{user_id}",
+                 lambda i: {"url": f"/api/users/{user_id(i)}"}, n),
+        Scenario("api_users", "GET", "/api/users",
+                 lambda i: {"url": "/api/users"}, max(1, n // 10)),
+        Scenario("api_user_posts", "GET", "/api/users/{user_id}/posts",
+                 lambda i: {"url": f"/api/users/{user_id(i)}/posts"}, n),
+        Scenario("api_update_user", "PATCH", "/api/users/{user_id}",
+                 lambda i: {"url": "/api/users/1", "headers": auth,
+                            "json": {"image_file": f"bench{i % 10}.jpg"}}, n),
+        Scenario("api_delete_user", "DELETE", "/api/users/{user_id}",
+                 lambda i: {"url": f"/api/users/{context['disposable_users'][i][0]}",
+                            "headers": {"Authorization": f"Bearer {context['disposable_users'][i][1]}"}},
+                 slow, expect=204),
+        # Web pages
+        Scenario("web_home", "GET", "/", lambda i: {"url": "/"}, n),
+        Scenario("web_posts", "GET", "/posts",
+                 lambda i: {"url": f"/posts?cursor={deep_cursor}" if i % 2 else "/posts"}, n),
+        Scenario("web_search", "GET", "/posts/search",
+                 lambda i: {"url": "/posts/search",
+                            "params": {"q": SEARCH_TERMS[i % len(SEARCH_TERMS)]}}, n),
+        Scenario("web_post_detail", "GET", "/posts/{post_id}",
+                 lambda i: {"url": f"/posts/{post_id(i)}"}, n),
+        Scenario("web_user_posts", "GET", "/users/{user_id}/posts",
+                 lambda i: {"url": f"/users/{user_id(i)}/posts"}, n),
+        Scenario("web_login", "GET", "/login", lambda i: {"url": "/login"}, n),
+        Scenario("web_register", "GET", "/register", lambda i: {"url": "/register"}, n),
+        Scenario("web_account", "GET", "/account", lambda i: {"url": "/account"}, n),
+        # Mounts
+        Scenario("static_stylesheet", "GET", "/static",
+                 lambda i: {"url": "/static/css/styles.css"}, n),
+        Scenario("media_avatar", "GET", "/media",
+                 lambda i: {"url": "/media/profile_pics/murtazo_photo.jpg"}, n),
+    ]
+
+
+def uncovered_routes(app, scenarios: list[Scenario]) -> list[str]:
+    """Routes of the app that no scenario drives and that are not SKIPPED."""
+    from fastapi.routing import APIRoute
+    from starlette.routing import Mount
+
+    covered = {(s.method, s.route) for s in scenarios}
+    missing = []
+    for route in app.routes:
+        if isinstance(route, Mount):
+            if ("GET", route.path) not in covered:
+                missing.append(f"GET {route.path}/*")
+        elif isinstance(route, APIRoute):
+            for method in sorted(route.methods):
+                key = (method, route.path)
+                if key not in covered and key not in SKIPPED:
+                    missing.append(f"{method} {route.path}")
+    return missing
+
+
+async def prepare(args: argparse.Namespace, url: str) -> dict:
+    """Generate the dataset plus the fixtures the write scenarios consume."""
+    from sqlalchemy import insert, select
+
+    import models
+    from benchmarks.dataset import generate, user_rows
+    from core.security import create_access_token, hash_password
+    from database import make_engine
+
+    info = await generate(url, args.users, args.posts, args.seed)
+    engine = make_engine(url, pool_size=1, max_overflow=0)
+    try:
+        async with engine.begin() as conn:
+            first_user = args.users + 1
+            await conn.execute(
+                insert(models.User),
+                user_rows(args.auth_requests, hash_password(info.password), first_user),
+            )
+            disposable_users = [
+                (user_id, create_access_token({"sub": str(user_id)}))
+                for user_id in range(first_user, first_user + args.auth_requests)
+            ]
+            result = await conn.execute(
+                insert(models.Post).returning(models.Post.id),
+                [{"title": "Disposable", "content": "Deleted by the benchmark.", "user_id": 1}
+                 for _ in range(args.requests)],
+            )
+            disposable_posts = list(result.scalars())
+            own_posts = list((await conn.execute(
+                select(models.Post.id)
+                .where(models.Post.user_id == 1, models.Post.id.not_in(disposable_posts))
+                .limit(50)
+            )).scalars())
+            deep = (await conn.execute(
+                select(models.Post.id, models.Post.date_posted)
+                .order_by(models.Post.date_posted.desc(), models.Post.id.desc())
+                .offset(args.posts // 2)
+                .limit(1)
+            )).one()
+    finally:
+        await engine.dispose()
+
+    return {
+        "password": info.password,
+        "token": create_access_token({"sub": "1"}),
+        "disposable_users": disposable_users,
+        "disposable_posts": disposable_posts,
+        "own_posts": own_posts or disposable_posts[:1],
+        "deep_post": {"id": deep.id, "date_posted": deep.date_posted},
+    }
+
+
+async def run_scenario(client, scenario: Scenario, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors: dict[str, int] = {}
+    next_index = 0
+    response_bytes = 0
+
+    async def worker() -> None:
+        nonlocal next_index, response_bytes
+        while next_index < scenario.iterations:
+            i = next_index
+            next_index += 1
+            kwargs = scenario.build(i)
+            start = time.perf_counter()
+            response = await client.request(scenario.method, **kwargs)
+            elapsed = time.perf_counter() - start
+            response_bytes += len(response.content)
+            if response.status_code == scenario.expect:
+                latencies.append(elapsed)
+            else:
+                key = str(response.status_code)
+                errors[key] = errors.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, scenario.iterations))))
+    wall = time.perf_counter() - started
+    return {
+        "method": scenario.method,
+        "route": scenario.route,
+        "requests": scenario.iterations,
+        "errors": dict(sorted(errors.items())),
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "latency_ms": summarize_ms(latencies),
+        "mean_response_bytes": round(response_bytes / max(1, scenario.iterations)),
+    }
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}"
+        # Settings are read at import time, so point the app at the temporary
+        # database before anything imports config
+        os.environ["DATABASE_URL"] = url
+        # Every scenario comes from one client; measure handlers, not 429s
+        os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+        import httpx
+
+        started = time.perf_counter()
+        context = await prepare(args, url)
+        dataset_seconds = time.perf_counter() - started
+
+        from main import app
+
+        scenarios = build_scenarios(args, context)
+        if args.only:
+            scenarios = [s for s in scenarios if s.name in args.only]
+        results = {}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for scenario in scenarios:
+                    results[scenario.name] = await run_scenario(client, scenario, args.concurrency)
+                    print(f"{scenario.name:28} {results[scenario.name]['throughput_rps']:>9} req/s",
+                          file=sys.stderr)
+
+        return {
+            "meta": {
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "users": args.users,
+                "posts": args.posts,
+                "seed": args.seed,
+                "concurrency": args.concurrency,
+                "dataset_seconds": round(dataset_seconds, 2),
+                "uncovered_routes": uncovered_routes(app, build_scenarios(args, context)),
+                "skipped_routes": {f"{m} {p}": reason for (m, p), reason in SKIPPED.items()},
+            },
+            "scenarios": results,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario")
+    parser.add_argument("--auth-requests", type=int, default=20,
+                        help="requests for scenarios that hash passwords")
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--output", default="bench_output.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"Wrote {args.output}", file=sys.stderr)
@@ -0,0 +1,87 @@
+"""Full-text search latency against a large synthetic dataset.
+
+Generates (or reuses) a SQLite database of --posts posts, then times
+`core.search.search_posts` for a few query shapes: a very common word, a
+rarer multi-word query, a phrase that matches nothing and a deep result
+page. The dataset draws from a few dozen words, so "common" queries match
+a large share of all posts and show the worst case: bm25 has to score every
+match before the top page is known. The 1M-post default takes a few
+minutes to generate; pass --path to keep the file around between runs.
+
+    SECRET_KEY=... python -m benchmarks.search --posts 1000000 --path /tmp/search.db
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import summarize_ms
+from benchmarks.dataset import generate, sqlite_url
+from core.search import search_posts
+from database import make_engine, sqlite_pragmas
+
+QUERIES = {
+    # (query, page)
+    "common_word": ("python", 1),
+    "two_words": ("cache latency", 1),
+    "three_words": ("sqlite cursor stream", 1),
+    "no_match": ("nonexistentword", 1),
+    "deep_page": ("python", 20),
+}
+
+
+async def time_queries(url: str, iterations: int, limit: int) -> dict:
+    engine = make_engine(url, pool_size=1, max_overflow=0, pragmas=sqlite_pragmas(read_only=True))
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    results = {}
+    try:
+        for name, (query, page) in QUERIES.items():
+            latencies = []
+            hits = 0
+            for _ in range(iterations):
+                start = time.perf_counter()
+                async with sessions() as session:
+                    found, _ = await search_posts(session, query, page, limit)
+                latencies.append(time.perf_counter() - start)
+                hits = len(found)
+            results[name] = {
+                "query": query,
+                "page": page,
+                "results": hits,
+                "latency_ms": summarize_ms(latencies),
+            }
+    finally:
+        await engine.dispose()
+    return results
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(args.path) if args.path else Path(tmp) / "search.db"
+        generate_seconds = None
+        if not path.exists():
+            started = time.perf_counter()
+            await generate(sqlite_url(str(path)), args.users, args.posts, args.seed)
+            generate_seconds = round(time.perf_counter() - started, 1)
+        return {
+            "posts": args.posts,
+            "database_bytes": os.path.getsize(path),
+            "generate_seconds": generate_seconds,
+            "queries": await time_queries(sqlite_url(str(path)), args.iterations, args.limit),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--path", help="reuse (or create and keep) this SQLite file")
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
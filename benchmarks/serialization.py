@@ -0,0 +1,106 @@
+"""Rows per second for list responses: ORM + validation vs. the row fast path.
+
+``orm`` reproduces what FastAPI does for a handler that returns ORM objects:
+load posts with selectinload(author), validate them through the response
+model with from_attributes, dump to Python primitives and json.dumps the
+result, as JSONResponse does. ``rows`` is `core.serialization`: one joined
+row query, model_construct and TypeAdapter.dump_json. Both must produce the
+same JSON document, which is checked before timing.
+
+    SECRET_KEY=... python -m benchmarks.serialization --items 10000
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import models
+from benchmarks.dataset import generate, sqlite_url
+from core.pagination import load_posts
+from core.serialization import load_post_rows, load_user_rows, post_list_adapter, user_list_adapter
+from database import make_engine, sqlite_pragmas
+from schemas import UserPublic
+
+
+def _render(content) -> bytes:
+    # starlette.responses.JSONResponse.render
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+async def orm_posts(session, ids) -> bytes:
+    posts = await load_posts(session, ids)
+    validated = post_list_adapter.validate_python(posts, from_attributes=True)
+    return _render(post_list_adapter.dump_python(validated, mode="json"))
+
+
+async def row_posts(session, ids) -> bytes:
+    return post_list_adapter.dump_json(await load_post_rows(session, ids))
+
+
+async def orm_users(session, _) -> bytes:
+    users = (await session.execute(select(models.User).order_by(models.User.id))).scalars().all()
+    adapter = TypeAdapter(list[UserPublic])
+    validated = adapter.validate_python(users, from_attributes=True)
+    return _render(adapter.dump_python(validated, mode="json"))
+
+
+async def row_users(session, _) -> bytes:
+    return user_list_adapter.dump_json(await load_user_rows(session))
+
+
+async def measure(sessions, encode, ids, rounds: int) -> tuple[float, bytes]:
+    best = float("inf")
+    body = b""
+    for _ in range(rounds):
+        async with sessions() as session:
+            start = time.perf_counter()
+            body = await encode(session, ids)
+            best = min(best, time.perf_counter() - start)
+    return best, body
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = sqlite_url(str(Path(tmp) / "serialization.db"))
+        await generate(url, args.items, args.items, args.seed)
+        engine = make_engine(url, pool_size=1, max_overflow=0, pragmas=sqlite_pragmas())
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        ids = list(range(args.items, 0, -1))
+        report = {"items": args.items}
+        try:
+            for name, before, after in (
+                ("posts", orm_posts, row_posts),
+                ("users", orm_users, row_users),
+            ):
+                orm_seconds, orm_body = await measure(sessions, before, ids, args.rounds)
+                row_seconds, row_body = await measure(sessions, after, ids, args.rounds)
+                if json.loads(orm_body) != json.loads(row_body):
+                    raise SystemExit(f"{name}: fast path output differs from the ORM path")
+                report[name] = {
+                    "orm_rows_per_second": round(args.items / orm_seconds),
+                    "rows_rows_per_second": round(args.items / row_seconds),
+                    "orm_ms": round(orm_seconds * 1000, 1),
+                    "rows_ms": round(row_seconds * 1000, 1),
+                    "speedup": round(orm_seconds / row_seconds, 2),
+                    "response_bytes": len(row_body),
+                }
+        finally:
+            await engine.dispose()
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10_000,
+                        help="posts (and users) per response")
+    parser.add_argument("--rounds", type=int, default=5, help="best of N")
+    parser.add_argument("--seed", type=int, default=0)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
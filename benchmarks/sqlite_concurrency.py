@@ -0,0 +1,140 @@
+"""Concurrent read/write throughput against a temporary SQLite database.
+
+Runs the same mixed workload (readers paging the feed, writers creating
+posts) under three engine profiles:
+
+- ``default``: no pragmas, rollback journal, the engine as it used to be
+- ``tuned``: the WAL/synchronous/cache/mmap/busy_timeout pragmas from Settings
+- ``read-pool``: ``tuned`` plus a separate query_only pool for readers
+
+    SECRET_KEY=... python -m benchmarks.sqlite_concurrency --seconds 5
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+import models
+from benchmarks.common import summarize_ms
+from core.pagination import apply_keyset
+from database import Base, make_engine, sqlite_pragmas
+
+
+async def seed(engine: AsyncEngine, posts: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(models.User), [
+            {"id": 1, "username": "bench", "email": "bench@example.com", "password_hash": "x"},
+        ])
+        start = datetime(2020, 1, 1, tzinfo=UTC)
+        await conn.execute(insert(models.Post), [
+            {
+                "title": f"Post {i}",
+                "content": "Lorem ipsum dolor sit amet. " * 20,
+                "user_id": 1,
+                "date_posted": start + timedelta(minutes=i),
+            }
+            for i in range(posts)
+        ])
+
+
+async def workload(
+    write_engine: AsyncEngine,
+    read_engine: AsyncEngine,
+    readers: int,
+    writers: int,
+    seconds: float,
+) -> dict:
+    write_sessions = async_sessionmaker(write_engine, expire_on_commit=False)
+    read_sessions = async_sessionmaker(read_engine, expire_on_commit=False)
+    read_latencies: list[float] = []
+    write_latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def reader() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with read_sessions() as session:
+                    result = await session.execute(apply_keyset(
+                        select(models.Post).options(selectinload(models.Post.author)),
+                        None,
+                        20,
+                    ))
+                    result.scalars().all()
+            except OperationalError:
+                errors += 1
+                continue
+            read_latencies.append(time.perf_counter() - start)
+
+    async def writer() -> None:
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with write_sessions() as session:
+                    session.add(models.Post(title="bench", content="write " * 50, user_id=1))
+                    await session.commit()
+            except OperationalError:
+                errors += 1
+                continue
+            write_latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(
+        *(reader() for _ in range(readers)),
+        *(writer() for _ in range(writers)),
+    )
+    return {
+        "reads_per_second": round(len(read_latencies) / seconds, 1),
+        "writes_per_second": round(len(write_latencies) / seconds, 1),
+        "read_latency_ms": summarize_ms(read_latencies),
+        "write_latency_ms": summarize_ms(write_latencies),
+        "errors": errors,
+    }
+
+
+async def run_profile(name: str, directory: Path, args: argparse.Namespace) -> dict:
+    url = f"sqlite+aiosqlite:///{directory / f'{name}.db'}"
+    pool = {"pool_size": args.readers + args.writers, "max_overflow": 0}
+    if name == "default":
+        write_engine = read_engine = make_engine(url, **pool)
+    else:
+        write_engine = read_engine = make_engine(url, pragmas=sqlite_pragmas(), **pool)
+        if name == "read-pool":
+            read_engine = make_engine(url, pragmas=sqlite_pragmas(read_only=True), **pool)
+
+    await seed(write_engine, args.posts)
+    try:
+        result = await workload(write_engine, read_engine, args.readers, args.writers, args.seconds)
+    finally:
+        await write_engine.dispose()
+        if read_engine is not write_engine:
+            await read_engine.dispose()
+    return {"profile": name, **result}
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    with tempfile.TemporaryDirectory() as tmp:
+        return [
+            await run_profile(name, Path(tmp), args)
+            for name in ("default", "tuned", "read-pool")
+        ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
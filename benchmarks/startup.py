@@ -0,0 +1,104 @@
+"""Worker startup: create_all at every start vs. the versioned migration runner.
+
+``create_all`` is what `main.lifespan` used to do: `Base.metadata.create_all`,
+CREATE INDEX IF NOT EXISTS for every model index, then the full-text index
+DDL. ``migrate`` is `core.migrations.migrate_database`, which returns after
+reading `schema_version`. Both are timed against an up-to-date --posts
+database with a new engine per round, as in a starting worker.
+
+The second part starts --workers processes at once on a new database file,
+as a multi-worker server does, and reports the wall time and how many of
+them failed.
+
+    SECRET_KEY=... python -m benchmarks.startup --posts 100000 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.schema import CreateIndex
+
+from benchmarks.common import summarize_ms
+from benchmarks.dataset import generate, sqlite_url
+from core.migrations import migrate_database
+from core.search import create_search_index
+from database import Base, make_engine, sqlite_pragmas
+
+
+def create_all(connection) -> None:
+    Base.metadata.create_all(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    create_search_index(connection)
+
+
+async def start_worker(url: str, strategy: str) -> None:
+    engine = make_engine(url, pool_size=1, max_overflow=0, pragmas=sqlite_pragmas())
+    try:
+        if strategy == "create_all":
+            async with engine.begin() as conn:
+                await conn.run_sync(create_all)
+        else:
+            await migrate_database(engine)
+    finally:
+        await engine.dispose()
+
+
+async def rounds(url: str, strategy: str, count: int) -> dict:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await start_worker(url, strategy)
+        samples.append(time.perf_counter() - started)
+    return summarize_ms(samples)
+
+
+def concurrent_start(url: str, strategy: str, workers: int) -> dict:
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.startup", "--worker", strategy, "--url", url],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for _ in range(workers)
+    ]
+    failed = sum(process.wait() != 0 for process in processes)
+    return {"workers": workers, "seconds": round(time.perf_counter() - started, 3), "failed": failed}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = sqlite_url(str(Path(tmp) / "startup.db"))
+        await generate(url, args.users, args.posts, args.seed)
+        report = {
+            strategy: await rounds(url, strategy, args.rounds)
+            for strategy in ("create_all", "migrate")
+        }
+        report["concurrent"] = {
+            strategy: concurrent_start(sqlite_url(str(Path(tmp) / f"{strategy}.db")), strategy, args.workers)
+            for strategy in ("create_all", "migrate")
+        }
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--worker", choices=["create_all", "migrate"], help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        asyncio.run(start_worker(args.url, args.worker))
+    else:
+        print(json.dumps(asyncio.run(main(args)), indent=2))
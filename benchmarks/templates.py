@@ -0,0 +1,88 @@
+"""Template compile time and feed rendering with and without fragment caching.
+
+``compile`` loads every template into a fresh environment three ways: with
+no bytecode cache (what each of the four per-router environments used to
+do), from an empty bytecode cache and from a warm one, as a new worker
+would. ``render`` runs the app in-process with the page cache off and
+requests --pages feed pages with the ``{% cache %}`` fragments disabled
+and enabled.
+
+    SECRET_KEY=... python -m benchmarks.templates --posts 10000 --pages 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from benchmarks.common import summarize_ms
+
+
+def compile_all(bytecode_cache: FileSystemBytecodeCache | None) -> float:
+    from core.templating import FragmentCacheExtension
+
+    env = Environment(
+        loader=FileSystemLoader("templates"),
+        autoescape=True,
+        extensions=[FragmentCacheExtension],
+        bytecode_cache=bytecode_cache,
+    )
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+    return time.perf_counter() - started
+
+
+async def render(client, pages: int) -> dict:
+    latencies = []
+    for _ in range(pages):
+        started = time.perf_counter()
+        response = await client.get("/posts")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return {"pages_per_second": round(pages / sum(latencies), 1), "latency_ms": summarize_ms(latencies)}
+
+
+async def main(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(tmp) / 'templates.db'}"
+        os.environ["PAGE_CACHE_ENABLED"] = "false"
+
+        import httpx
+
+        from benchmarks.dataset import generate, sqlite_url
+        from config import settings
+        from core.templating import fragment_cache
+        from main import app
+
+        bytecode_cache = FileSystemBytecodeCache(str(Path(tmp) / "bytecode"))
+        (Path(tmp) / "bytecode").mkdir()
+        report = {"compile_ms": {
+            "no_bytecode_cache": round(compile_all(None) * 1000, 2),
+            "cold_bytecode_cache": round(compile_all(bytecode_cache) * 1000, 2),
+            "warm_bytecode_cache": round(compile_all(bytecode_cache) * 1000, 2),
+        }}
+
+        await generate(sqlite_url(str(Path(tmp) / "templates.db")), args.users, args.posts, args.seed)
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name, enabled in (("without_fragments", False), ("with_fragments", True)):
+                    settings.fragment_cache_enabled = enabled
+                    fragment_cache.clear()
+                    await client.get("/posts")
+                    report[name] = await render(client, args.pages)
+        return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pages", type=int, default=200)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -0,0 +1,124 @@
+"""Concurrent post updates: select-check-write vs. UPDATE ... RETURNING.
+
+``select_then_write`` is how the post mutation handlers used to work: load
+the post, check ownership in Python, assign, commit, then refresh the
+author. ``returning`` is the current path: one conditional UPDATE with
+ownership in the WHERE clause and RETURNING for the response. Each profile
+runs --writers concurrent writers (plus --readers paging the feed) for
+--seconds against the tuned SQLite engine.
+
+    SECRET_KEY=... python -m benchmarks.write_contention --writers 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import models
+from benchmarks.common import summarize_ms
+from benchmarks.dataset import generate, sqlite_url
+from core.pagination import apply_keyset, select_post_versions
+from database import make_engine, sqlite_pragmas
+
+USER_ID = 1
+
+
+async def select_then_write(session, post_id: int, title: str) -> None:
+    post = (await session.execute(
+        select(models.Post).where(models.Post.id == post_id)
+    )).scalars().first()
+    if post is None or post.user_id != USER_ID:
+        raise LookupError(post_id)
+    post.title = title
+    await session.commit()
+    await session.refresh(post, attribute_names=["author"])
+
+
+async def returning(session, post_id: int, title: str) -> None:
+    result = await session.execute(
+        update(models.Post)
+        .where(models.Post.id == post_id, models.Post.user_id == USER_ID)
+        .values(title=title)
+        .returning(models.Post.id, models.Post.title, models.Post.content,
+                   models.Post.user_id, models.Post.date_posted)
+        .execution_options(synchronize_session=False)
+    )
+    if result.first() is None:
+        raise LookupError(post_id)
+    await session.commit()
+
+
+async def run(sessions, write, post_ids: list[int], writers: int, readers: int, seconds: float) -> dict:
+    latencies: list[float] = []
+    reads = 0
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def writer(seed: int) -> None:
+        nonlocal errors
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with sessions() as session:
+                    await write(session, rng.choice(post_ids), f"Title {rng.random()}")
+            except OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    async def reader() -> None:
+        nonlocal reads
+        while time.perf_counter() < deadline:
+            async with sessions() as session:
+                (await session.execute(apply_keyset(select_post_versions(), None, 20))).all()
+            reads += 1
+
+    await asyncio.gather(*(writer(i) for i in range(writers)), *(reader() for _ in range(readers)))
+    return {
+        "writes_per_second": round(len(latencies) / seconds, 1),
+        "reads_per_second": round(reads / seconds, 1),
+        "write_latency_ms": summarize_ms(latencies),
+        "errors": errors,
+    }
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        url = sqlite_url(str(Path(tmp) / "contention.db"))
+        await generate(url, args.users, args.posts, args.seed)
+        for writers in args.writers:
+            engine = make_engine(
+                url, pool_size=writers + args.readers, max_overflow=0, pragmas=sqlite_pragmas()
+            )
+            sessions = async_sessionmaker(engine, expire_on_commit=False)
+            async with sessions() as session:
+                post_ids = list((await session.execute(
+                    select(models.Post.id).where(models.Post.user_id == USER_ID)
+                )).scalars())
+            try:
+                for name, write in (("select_then_write", select_then_write), ("returning", returning)):
+                    result = await run(sessions, write, post_ids, writers, args.readers, args.seconds)
+                    results.append({"strategy": name, "writers": writers, **result})
+            finally:
+                await engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    print(json.dumps(asyncio.run(main(parser.parse_args())), indent=2))
@@ -10,10 +10,83 @@ class Settings(BaseSettings):
     secret_key: SecretStr
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 32
+    password_hash_use_processes: bool = False
+    page_size: int = 10
+    max_page_size: int = 100
+    export_batch_size: int = 1000
+    bulk_max_items: int = 10_000
+    bulk_insert_chunk_size: int = 500
+    purge_chunk_size: int = 500
+    purge_pause_seconds: float = 0.01
+    jobs_workers: int = 4
+    jobs_queue_size: int = 10_000
+    jobs_persistent: bool = False
+    jobs_max_attempts: int = 5
+    jobs_retry_backoff_seconds: float = 0.5
+    jobs_drain_timeout: float = 10.0
+    sse_max_subscribers: int = 10_000
+    sse_queue_size: int = 64
+    sse_history_size: int = 1000
+    sse_heartbeat_seconds: float = 15.0
+    sse_retry_ms: int = 3000
+    admission_enabled: bool = True
+    admission_limit: int = 64
+    admission_login_limit: int = 4
+    admission_feed_limit: int = 32
+    admission_export_limit: int = 2
+    admission_write_limit: int = 8
+    admission_queue_size: int = 64
+    admission_queue_timeout: float = 2.0
+    admission_retry_after: int = 1
+    rate_limit_enabled: bool = True
+    rate_limit_store: str = "memory"
+    rate_limit_memory_size: int = 100_000
+    rate_limit_sqlite_path: str = "ratelimit.db"
+    # Per-process caches: another worker's update or delete of a user is
+    # only seen after auth_cache_ttl, so keep it short
+    auth_cache_enabled: bool = True
+    auth_cache_size: int = 10_000
+    auth_cache_ttl: float = 30.0
+    metrics_enabled: bool = False
+    metrics_path: str = "/metrics"
+    page_cache_enabled: bool = True
+    page_cache_size: int = 1024
+    page_cache_ttl: float = 60.0
+    fragment_cache_enabled: bool = True
+    fragment_cache_size: int = 10_000
+    fragment_cache_ttl: float = 600.0
+    template_cache_dir: str | None = None
+    compression_enabled: bool = True
+    compression_minimum_size: int = 500
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    query_log_enabled: bool = False
+    query_log_endpoint_enabled: bool = False
+    query_log_path: str = "/api/debug/queries"
+    query_log_buffer_size: int = 200
+    slow_query_threshold_ms: float = 100.0
+    query_repeat_threshold: int = 2
     # app_name: str = "FastAPI Blog"
     # admin_email: str
     # items_per_user: int = 50
-    # database_url: str
+    database_url: str = "sqlite+aiosqlite:///./blog.db"
+    database_read_url: str | None = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_read_pool_enabled: bool = False
+    db_read_pool_size: int = 10
+    db_read_max_overflow: int = 10
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_cache_size: int = -64000
+    sqlite_mmap_size: int = 268_435_456
+    sqlite_busy_timeout: int = 5000
 
 settings = Settings()
                          
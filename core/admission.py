@@ -0,0 +1,174 @@
+"""Admission control: concurrency limits with a bounded wait queue.
+
+Every request takes a slot from the global limiter, and requests of an
+expensive route class (logins and signups, feeds, exports, writes) first
+take one from their class limiter. When no slot is free a request waits in
+a FIFO queue of bounded length, for at most `admission_queue_timeout`
+seconds in total. A request that finds the queue full, or whose deadline
+passes, gets an immediate 503 with Retry-After instead of adding to the
+latency of everyone else.
+
+Static files, media and the live feed stream are exempt; a stream would
+hold its slot for as long as the client stays connected.
+"""
+import asyncio
+import re
+from collections import deque
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+from core.metrics import LATENCY_BUCKETS, Counter, Gauge, Histogram, register_metric
+
+admission_wait = Histogram(
+    "admission_wait_seconds", "Time requests spent queued for a slot.", ("class",), LATENCY_BUCKETS
+)
+admission_shed = Counter(
+    "admission_shed_total", "Requests rejected with 503 by admission control.", ("class", "reason")
+)
+admission_active = Gauge("admission_active", "Requests holding a slot.", ("class",))
+admission_queued = Gauge("admission_queued", "Requests waiting for a slot.", ("class",))
+for _metric in (admission_wait, admission_shed, admission_active, admission_queued):
+    register_metric(_metric)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+EXEMPT = re.compile(r"^/(?:static|media)/|^/api/posts/stream$")
+# (methods, path, class); the first match wins, writes are the fallback
+# for unsafe methods under /api
+ROUTE_CLASSES = (
+    ({"POST"}, re.compile(r"^/api/users(?:/token)?$"), "login"),
+    # GET /api/users is unpaginated and returns the whole table, like an export
+    (SAFE_METHODS, re.compile(r"^/api/export/|^/api/users$"), "export"),
+    (SAFE_METHODS, re.compile(
+        r"^/(?:posts)?$|^/posts/search$|^/users/\d+/posts$|^/api/posts(?:/search)?$|^/api/users/\d+/posts$"
+    ), "feed"),
+)
+
+
+def route_class(method: str, path: str) -> str | None:
+    for methods, pattern, name in ROUTE_CLASSES:
+        if method in methods and pattern.match(path):
+            return name
+    if method not in SAFE_METHODS and path.startswith("/api/"):
+        return "write"
+    return None
+
+
+class Limiter:
+    """At most `limit` holders, and at most `queue_size` waiting in FIFO order."""
+
+    def __init__(self, name: str, limit: int, queue_size: int):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, deadline: float) -> str | None:
+        """Take a slot before `deadline` (loop time); returns why not otherwise."""
+        if self.active < self.limit and not self._waiters:
+            self._take()
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        admission_queued.inc((self.name,))
+        started = loop.time()
+        try:
+            async with asyncio.timeout_at(deadline):
+                await waiter
+        except TimeoutError:
+            # release() may have handed over the slot just as the deadline hit
+            if not self._granted(waiter):
+                return "timeout"
+        except asyncio.CancelledError:
+            # The client went away; pass on a slot handed over meanwhile
+            if self._granted(waiter):
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            admission_queued.dec((self.name,))
+            admission_wait.observe((self.name,), loop.time() - started)
+        return None
+
+    @staticmethod
+    def _granted(waiter: asyncio.Future) -> bool:
+        return waiter.done() and not waiter.cancelled()
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter so nobody can jump the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+        admission_active.dec((self.name,))
+
+    def _take(self) -> None:
+        self.active += 1
+        admission_active.inc((self.name,))
+
+
+def build_limiters() -> tuple[Limiter, dict[str, Limiter]]:
+    queue_size = settings.admission_queue_size
+    classes = {
+        "login": settings.admission_login_limit,
+        "feed": settings.admission_feed_limit,
+        "export": settings.admission_export_limit,
+        "write": settings.admission_write_limit,
+    }
+    return (
+        Limiter("global", settings.admission_limit, queue_size),
+        {name: Limiter(name, limit, queue_size) for name, limit in classes.items()},
+    )
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware shedding load once the limiters are saturated."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.global_limiter, self.class_limiters = build_limiters()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or EXEMPT.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        name = route_class(scope["method"], scope["path"])
+        deadline = asyncio.get_running_loop().time() + settings.admission_queue_timeout
+        held: list[Limiter] = []
+        try:
+            # Always class before global, so two requests never wait on each other
+            for limiter in (self.class_limiters.get(name), self.global_limiter):
+                if limiter is None:
+                    continue
+                if (reason := await limiter.acquire(deadline)) is not None:
+                    admission_shed.inc((limiter.name, reason))
+                    await self._reject(scope, receive, send)
+                    return
+                held.append(limiter)
+            await self.app(scope, receive, send)
+        finally:
+            for limiter in reversed(held):
+                limiter.release()
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(
+            {"detail": "Server is busy, please try again shortly."},
+            status_code=503,
+            headers={"Retry-After": str(settings.admission_retry_after)},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,87 @@
+"""Content-hashed URLs for static files and avatars.
+
+`asset_url("/static/css/styles.css")` returns
+``/static/css/styles.css?v=<hash>``, where the hash is taken from the
+file's bytes. Hashes are cached per file and recomputed when its size or
+mtime changes, so replacing a file (a new avatar, an edited stylesheet)
+yields a new URL on the next render. The mounts below serve a URL whose
+`v` matches the current hash as immutable for a year; anything else keeps
+the default revalidation.
+"""
+import hashlib
+import os
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from starlette.responses import Response
+from starlette.types import Scope
+
+from core.compression import PrecompressedStaticFiles
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+HASH_LENGTH = 12
+
+
+class AssetManifest:
+    """Maps URL prefixes to directories and fingerprints the files in them."""
+
+    def __init__(self, roots: dict[str, str]):
+        self.roots = {prefix.rstrip("/") + "/": Path(directory).resolve() for prefix, directory in roots.items()}
+        # path -> (mtime_ns, size, digest)
+        self._hashes: dict[str, tuple[int, int, str]] = {}
+
+    def version(self, path: str | os.PathLike) -> str | None:
+        """Content hash of the file at `path`, or None if it does not exist."""
+        path = os.fspath(path)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        cached = self._hashes.get(path)
+        if cached is not None and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+            return cached[2]
+        with open(path, "rb") as file:
+            digest = hashlib.file_digest(file, "blake2b").hexdigest()[:HASH_LENGTH]
+        self._hashes[path] = (stat_result.st_mtime_ns, stat_result.st_size, digest)
+        return digest
+
+    def resolve(self, url: str) -> Path | None:
+        for prefix, root in self.roots.items():
+            if url.startswith(prefix):
+                path = (root / url[len(prefix):]).resolve()
+                if path.is_relative_to(root):
+                    return path
+        return None
+
+    def url(self, url: str) -> str:
+        """`url` with a ?v= fingerprint, or unchanged if it isn't a known file."""
+        path = self.resolve(url)
+        version = self.version(path) if path is not None else None
+        if version is None:
+            return url
+        return f"{url}?v={version}"
+
+
+manifest = AssetManifest({"/static": "static", "/media": "media"})
+
+
+def asset_url(url: str) -> str:
+    """Jinja helper: the fingerprinted URL of a /static or /media file."""
+    return manifest.url(url)
+
+
+class HashedStaticFiles(PrecompressedStaticFiles):
+    """Serves fingerprinted requests with a year-long immutable Cache-Control."""
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        requested = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v")
+        if requested and requested[0] == manifest.version(full_path):
+            response.headers["Cache-Control"] = IMMUTABLE
+        return response
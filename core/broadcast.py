@@ -0,0 +1,176 @@
+"""In-process fan-out of post events to Server-Sent Events subscribers.
+
+Each event is encoded into an SSE frame once and the same bytes are queued
+for every subscriber, so publishing costs one `put_nowait` per subscriber.
+Queues are bounded: a subscriber whose queue is full is a slow consumer and
+is disconnected rather than buffered for. Its EventSource reconnects with
+`Last-Event-ID` and catches up from the ring buffer of recent events; a
+client whose last event is no longer in the buffer gets a ``reset`` event
+and should reload the feed.
+
+Write handlers publish through the ``broadcast`` job (core.jobs), so the
+fan-out runs after the commit rather than inside the request. Event ids
+are ``<stream>-<seq>``, where the stream id is unique to this process and
+boot. With several workers a reconnect can land on another one, whose
+buffer means nothing for that id, so a foreign stream id gets ``reset``
+rather than a guessed resume point. The broadcaster only sees writes made
+by this process.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from typing import AsyncIterator
+
+from config import settings
+from core.jobs import job
+
+_CLOSE = None
+HEARTBEAT = b": ping\n\n"
+RESET = b"event: reset\ndata: {}\n\n"
+
+
+@dataclass(frozen=True)
+class Event:
+    seq: int
+    frame: bytes
+
+
+def encode_frame(event_id: str | None, event: str, data: str) -> bytes:
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class Subscription:
+    def __init__(self, broadcaster: "Broadcaster", backlog: list[bytes]):
+        self.broadcaster = broadcaster
+        self.backlog = backlog
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=settings.sse_queue_size)
+
+    def offer(self, frame: bytes) -> bool:
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def close(self) -> None:
+        """End the stream now, discarding whatever is still queued."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_CLOSE)
+
+    async def frames(self) -> AsyncIterator[bytes]:
+        try:
+            yield f"retry: {settings.sse_retry_ms}\n\n".encode()
+            for frame in self.backlog:
+                yield frame
+            self.backlog = []
+            while (frame := await self.queue.get()) is not _CLOSE:
+                yield frame
+        finally:
+            self.broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    def __init__(self, history_size: int, max_subscribers: int):
+        self.max_subscribers = max_subscribers
+        self._subscribers: set[Subscription] = set()
+        self._history: deque[Event] = deque(maxlen=history_size)
+        self.stream_id = f"{time.time_ns() // 1_000_000:x}.{os.getpid():x}"
+        self._last_id = 0
+        self._heartbeat: asyncio.Task | None = None
+        self.published = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, last_event_id: str | None = None) -> Subscription | None:
+        """Register a subscriber, or return None when at `max_subscribers`.
+
+        Events after `last_event_id` (a Last-Event-ID header value) are
+        replayed from the ring buffer before live ones.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscription = Subscription(self, self._backlog(last_event_id))
+        self._subscribers.add(subscription)
+        if self._heartbeat is None:
+            self._heartbeat = asyncio.create_task(self._send_heartbeats(), name="sse-heartbeat")
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, event: str, data: str) -> str:
+        """Queue an event for every subscriber; returns its id."""
+        self._last_id += 1
+        event_id = f"{self.stream_id}-{self._last_id}"
+        frame = encode_frame(event_id, event, data)
+        self._history.append(Event(self._last_id, frame))
+        self.published += 1
+        self._fan_out(frame)
+        return event_id
+
+    def _fan_out(self, frame: bytes) -> None:
+        slow = [subscription for subscription in self._subscribers if not subscription.offer(frame)]
+        for subscription in slow:
+            self.dropped += 1
+            self._subscribers.discard(subscription)
+            subscription.close()
+
+    def _backlog(self, last_event_id: str | None) -> list[bytes]:
+        if not last_event_id:
+            return []
+        stream_id, _, seq = last_event_id.rpartition("-")
+        # Another process or boot: its sequence numbers don't apply here
+        if stream_id != self.stream_id or not seq.isdigit():
+            return [RESET]
+        last_seq = int(seq)
+        if last_seq >= self._last_id:
+            return []
+        # Ids in the buffer are consecutive, so the resume point is an offset
+        if not self._history or last_seq < self._history[0].seq - 1:
+            return [RESET]
+        start = last_seq - self._history[0].seq + 1
+        return [event.frame for event in islice(self._history, start, None)]
+
+    async def _send_heartbeats(self) -> None:
+        # One timer for all subscribers; keeps proxies from closing idle streams
+        while True:
+            await asyncio.sleep(settings.sse_heartbeat_seconds)
+            self._fan_out(HEARTBEAT)
+
+    async def close(self) -> None:
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "dropped": self.dropped,
+            "history": len(self._history),
+        }
+
+
+broadcaster = Broadcaster(
+    history_size=settings.sse_history_size,
+    max_subscribers=settings.sse_max_subscribers,
+)
+
+
+@job("broadcast", durable=False)
+async def broadcast(event: str, data: str) -> None:
+    """Publish a live feed event once the write it describes has committed."""
+    broadcaster.publish(event, data)
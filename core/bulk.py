@@ -0,0 +1,93 @@
+"""Parsing and validation of bulk post imports.
+
+A body is either a JSON array of PostCreate objects or NDJSON, one object
+per line. Items are validated in a single pass; invalid ones are reported
+by position instead of failing the whole request.
+"""
+from dataclasses import dataclass, field
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter, ValidationError
+from pydantic_core import from_json
+
+from config import settings
+from schemas import PostCreate
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+
+post_create_list_adapter = TypeAdapter(list[PostCreate])
+
+
+@dataclass
+class BulkItems:
+    valid: list[tuple[int, PostCreate]] = field(default_factory=list)
+    errors: list[dict] = field(default_factory=list)
+
+
+def _item_errors(exc: ValidationError) -> list[dict]:
+    return [
+        {
+            "loc": list(error["loc"]),
+            "msg": error["msg"],
+            "type": error["type"],
+        }
+        for error in exc.errors(include_url=False, include_context=False, include_input=False)
+    ]
+
+
+def _too_many(count: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"At most {settings.bulk_max_items} posts per request, got {count}."
+    )
+
+
+def parse_json_array(body: bytes) -> BulkItems:
+    try:
+        raw = from_json(body)
+    except ValueError:
+        raw = None
+    if not isinstance(raw, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Request body must be a JSON array of posts."
+        )
+    if len(raw) > settings.bulk_max_items:
+        raise _too_many(len(raw))
+
+    items = BulkItems()
+    try:
+        posts = post_create_list_adapter.validate_python(raw)
+    except ValidationError as exc:
+        # Group the failures by item, then keep everything that passed
+        failed: dict[int, list[dict]] = {}
+        for error in _item_errors(exc):
+            failed.setdefault(error["loc"][0], []).append({**error, "loc": error["loc"][1:]})
+        items.errors = [{"index": index, "errors": errors} for index, errors in sorted(failed.items())]
+        posts = [
+            None if index in failed else PostCreate.model_validate(item)
+            for index, item in enumerate(raw)
+        ]
+    items.valid = [(index, post) for index, post in enumerate(posts) if post is not None]
+    return items
+
+
+def parse_ndjson(body: bytes) -> BulkItems:
+    lines = [line for line in body.splitlines() if line.strip()]
+    if len(lines) > settings.bulk_max_items:
+        raise _too_many(len(lines))
+
+    items = BulkItems()
+    for index, line in enumerate(lines):
+        try:
+            items.valid.append((index, PostCreate.model_validate_json(line)))
+        except ValidationError as exc:
+            items.errors.append({"index": index, "errors": _item_errors(exc)})
+    return items
+
+
+def parse_bulk_posts(body: bytes, content_type: str) -> BulkItems:
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    if media_type in NDJSON_TYPES:
+        return parse_ndjson(body)
+    return parse_json_array(body)
@@ -0,0 +1,178 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+
+from config import settings
+
+
+_registry: dict[str, "TTLCache | PageCache"] = {}
+
+
+def register_cache(name: str, cache: "TTLCache | PageCache") -> None:
+    """Make a cache's counters visible through `cache_stats`."""
+    _registry[name] = cache
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after `ttl` seconds.
+
+    Not thread-safe; it is meant to be used from the event loop only.
+    `on_discard` is called with (key, value) whenever an entry is evicted or
+    expires, but not when it is removed explicitly.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_discard: Callable[[Hashable, Any], None] | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_discard = on_discard
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            if self.on_discard is not None:
+                self.on_discard(key, value)
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted_key, (_, evicted) = self._data.popitem(last=False)
+            self.evictions += 1
+            if self.on_discard is not None:
+                self.on_discard(evicted_key, evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def discard_values(self, value: Any) -> None:
+        """Remove every entry holding `value`; a full scan, for rare invalidations."""
+        for key in [key for key, (_, held) in self._data.items() if held == value]:
+            del self._data[key]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    body: bytes
+    media_type: str | None
+    tags: frozenset[str]
+
+
+class PageCache:
+    """Cache of fully rendered HTML pages, invalidated by tags.
+
+    Pages are keyed by their full URL (route and query parameters) and tagged
+    with the resources they display, e.g. ``feed``, ``post:3`` or ``user:7``.
+    Write handlers invalidate by tag. A page rendered while an invalidation
+    happened is not stored, since it may have read the old rows.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, enabled: bool = True):
+        self.enabled = enabled
+        self._cache = TTLCache(maxsize, ttl, on_discard=self._untag)
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self._generation = 0
+        self.invalidations = 0
+
+    def get(self, request: Request) -> Response | None:
+        if not self.enabled:
+            return None
+        page = self._cache.get(str(request.url))
+        if page is None:
+            request.state.page_cache_generation = self._generation
+            return None
+        return HTMLResponse(content=page.body, media_type=page.media_type)
+
+    def store(self, request: Request, response: Response, tags: Iterable[str]) -> None:
+        if not self.enabled or response.status_code != 200:
+            return
+        if getattr(request.state, "page_cache_generation", None) != self._generation:
+            return
+        key = str(request.url)
+        if (old := self._cache.pop(key)) is not None:
+            self._untag(key, old)
+        page = CachedPage(response.body, response.media_type, frozenset(tags))
+        self._cache.set(key, page)
+        for tag in page.tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+
+    def invalidate(self, *tags: str) -> None:
+        self._generation += 1
+        for tag in tags:
+            for key in list(self._keys_by_tag.get(tag, ())):
+                page = self._cache.pop(key)
+                if page is not None:
+                    self.invalidations += 1
+                    self._untag(key, page)
+            self._keys_by_tag.pop(tag, None)
+
+    def _untag(self, key: str, page: CachedPage) -> None:
+        for tag in page.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._keys_by_tag.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {**self._cache.stats(), "invalidations": self.invalidations}
+
+
+page_cache = PageCache(
+    maxsize=settings.page_cache_size,
+    ttl=settings.page_cache_ttl,
+    enabled=settings.page_cache_enabled,
+)
+register_cache("pages", page_cache)
@@ -0,0 +1,296 @@
+"""Negotiated gzip/Brotli compression for responses and static files.
+
+`CompressionMiddleware` compresses text-like responses on the fly. Brotli
+is used when the optional `brotli` package is installed and the client
+accepts it, gzip otherwise. Streaming responses are compressed chunk by
+chunk with a sync flush, so clients still receive each chunk as soon as it
+is produced. Responses that are already encoded, event streams and bodies
+under the size threshold are not compressed. Compressible types always get
+`Vary: Accept-Encoding`, and a weak ETag for clients that accept an
+encoding, so identity bodies and 304s match the compressed responses.
+
+`PrecompressedStaticFiles` serves ``file.css.br`` / ``file.css.gz`` next to
+``file.css`` when the client accepts them, so static assets cost no CPU per
+request. Generate those files at build time with:
+
+    python -m core.compression static
+"""
+import argparse
+import gzip
+import mimetypes
+import os
+import stat
+import zlib
+from pathlib import Path
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from config import settings
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Preference order when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+}
+PRECOMPRESS_EXTENSIONS = {".css", ".js", ".json", ".svg", ".txt", ".html", ".webmanifest", ".map"}
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(header: str, available: tuple[str, ...] = ENCODINGS) -> str | None:
+    """The best of `available` that the Accept-Encoding `header` allows."""
+    if not header:
+        return None
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.partition(";")[0].strip().lower()
+    if media_type == "text/event-stream":
+        return False
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=settings.compression_brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(settings.compression_gzip_level, zlib.DEFLATED, 31)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress `data` and flush it, so the client can decode it now."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Pure ASGI middleware compressing responses the client can decode."""
+
+    def __init__(self, app: ASGIApp, minimum_size: int | None = None):
+        self.app = app
+        self.minimum_size = settings.compression_minimum_size if minimum_size is None else minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None or scope["method"] == "HEAD":
+            async def send_headers_only(message: Message) -> None:
+                await send(self._negotiated(message, encoding))
+
+            await self.app(scope, receive, send_headers_only)
+            return
+
+        start: Message | None = None
+        encoder: _Encoder | None = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows how big it is
+                start = self._negotiated(message, encoding)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=start["headers"])
+                compressible = (
+                    is_compressible(headers.get("content-type", ""))
+                    and "content-encoding" not in headers
+                    and start["status"] not in (204, 206, 304)
+                )
+                if not compressible or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+
+                encoder = _Encoder(encoding)
+                headers["Content-Encoding"] = encoding
+                # Byte ranges would address the uncompressed body
+                del headers["accept-ranges"]
+                if more_body:
+                    del headers["content-length"]
+                    await send(start)
+                    start = None
+                    await send({"type": "http.response.body", "body": encoder.chunk(body), "more_body": True})
+                else:
+                    data = encoder.finish(body)
+                    headers["Content-Length"] = str(len(data))
+                    await send(start)
+                    start = None
+                    await send({"type": "http.response.body", "body": data, "more_body": False})
+                return
+
+            if more_body:
+                if data := encoder.chunk(body):
+                    await send({"type": "http.response.body", "body": data, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.finish(body), "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _negotiated(message: Message, encoding: str | None) -> Message:
+        """Mark a response start whose body depends on Accept-Encoding.
+
+        That is any compressible type, and anything already marked so, like
+        the 304s of such resources, which carry no Content-Type. Every
+        response a compressing client gets for them carries a weak ETag,
+        whether or not this body ends up compressed (it may be too small),
+        so 200s and 304s for the same resource agree.
+        """
+        if message["type"] != "http.response.start":
+            return message
+        headers = MutableHeaders(raw=message["headers"])
+        varies = "accept-encoding" in headers.get("vary", "").lower()
+        if not varies and not is_compressible(headers.get("content-type", "")):
+            return message
+        if not varies:
+            headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if encoding is not None and etag and not etag.startswith("W/"):
+            # The compressed bytes differ, but the representation is
+            # the same, so conditional requests keep working
+            headers["ETag"] = f"W/{etag}"
+        return message
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that prefers prebuilt .br/.gz siblings of a file."""
+
+    def file_response(
+        self,
+        full_path: str | os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), self._encodings(full_path))
+        if encoding is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            # Also on the 304, whose headers don't show the type
+            if is_compressible(mimetypes.guess_type(str(full_path))[0] or "text/plain"):
+                response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        variant = f"{full_path}{SUFFIXES[encoding]}"
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+        response = FileResponse(
+            variant, status_code=status_code, stat_result=os.stat(variant), media_type=media_type
+        )
+        response.headers["Content-Encoding"] = encoding
+        response.headers.add_vary_header("Accept-Encoding")
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _encodings(full_path: str | os.PathLike) -> tuple[str, ...]:
+        found = []
+        for encoding in ("br", "gzip"):
+            try:
+                if stat.S_ISREG(os.stat(f"{full_path}{SUFFIXES[encoding]}").st_mode):
+                    found.append(encoding)
+            except OSError:
+                continue
+        return tuple(found)
+
+
+def precompress(directory: Path) -> list[Path]:
+    """Write .gz (and .br, if available) next to every text asset under `directory`.
+
+    Files are skipped when their variants are newer than the source, and a
+    variant that would not be smaller than the source is not written.
+    """
+    written = []
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file() or path.suffix not in PRECOMPRESS_EXTENSIONS:
+            continue
+        source = path.read_bytes()
+        encoders = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            encoders[".br"] = lambda data: brotli.compress(data, quality=11)
+        for suffix, encode in encoders.items():
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= path.stat().st_mtime:
+                continue
+            data = encode(source)
+            if len(data) >= len(source):
+                target.unlink(missing_ok=True)
+                continue
+            target.write_bytes(data)
+            written.append(target)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompress static assets.")
+    parser.add_argument("directory", nargs="?", default="static")
+    args = parser.parse_args()
+    for target in precompress(Path(args.directory)):
+        print(target)
+    if brotli is None:
+        print("brotli is not installed; only .gz files were written")
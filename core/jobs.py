@@ -0,0 +1,271 @@
+"""Background jobs that run after the enqueuing transaction commits.
+
+Handlers are registered by name with `@job`, and write handlers call
+`enqueue(db, name, **payload)` before committing. The job is handed to the
+worker pool only once the session commits, and is dropped on rollback, so a
+side effect never runs for a write that didn't happen and never delays the
+response.
+
+With `jobs_persistent` on, durable jobs are also inserted into the `jobs`
+table in the same transaction. The row is deleted when the job succeeds, and
+rows left by a crash or an unfinished drain are queued again at the next
+start. Jobs therefore run at least once and handlers should be idempotent.
+
+Job types registered with a `key` run at most once at a time per value of
+that payload field in this process: enqueueing a duplicate while one is
+queued, running or waiting for a retry is a no-op.
+
+Failed jobs are retried with exponential backoff up to `jobs_max_attempts`.
+When `jobs_queue_size` jobs are waiting, `enqueue` refuses with a 503 so
+the write is not committed either.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+from config import settings
+from database import AsyncSessionLocal
+
+logger = logging.getLogger("blog.jobs")
+
+PENDING_KEY = "pending_jobs"
+
+Handler = Callable[..., Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class JobType:
+    name: str
+    handler: Handler
+    durable: bool
+    key: str | None = None
+
+
+@dataclass
+class QueuedJob:
+    type: JobType
+    payload: dict
+    # Pending insert until the commit assigns `row_id`
+    row: "models.Job | None" = None
+    row_id: int | None = None
+    attempts: int = 0
+
+    @property
+    def key(self) -> tuple | None:
+        if self.type.key is None:
+            return None
+        return self.type.name, self.payload[self.type.key]
+
+
+_registry: dict[str, JobType] = {}
+
+
+def job(name: str, durable: bool = True, key: str | None = None) -> Callable[[Handler], Handler]:
+    """Register an async function as the handler for jobs called `name`.
+
+    Non-durable jobs are never persisted, e.g. live feed events that are
+    worthless after a restart. With `key`, jobs whose payloads have the
+    same value for that field are deduplicated.
+    """
+    def register(handler: Handler) -> Handler:
+        _registry[name] = JobType(name, handler, durable, key)
+        return handler
+    return register
+
+
+class JobQueue:
+    def __init__(self, workers: int, max_queued: int, persistent: bool):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.persistent = persistent
+        self._queue: asyncio.Queue[QueuedJob] | None = None
+        self._workers: list[asyncio.Task] = []
+        self._retries: set[asyncio.TimerHandle] = set()
+        # Keys of jobs enqueued and not yet finished, rolled back or failed
+        self._keys: set[tuple] = set()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return 0 if self._queue is None else self._queue.qsize()
+
+    def enqueue(self, session: AsyncSession, name: str, **payload) -> bool:
+        """Run job `name` with `payload` once `session` commits.
+
+        Returns False when an identical keyed job is already in flight.
+        """
+        queued = QueuedJob(_registry[name], payload)
+        if queued.key is not None and queued.key in self._keys:
+            return False
+        if self.queued + len(self._retries) >= self.max_queued:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        if self.persistent and queued.type.durable:
+            queued.row = models.Job(name=name, payload=json.dumps(payload))
+            session.add(queued.row)
+        if queued.key is not None:
+            self._keys.add(queued.key)
+        session.info.setdefault(PENDING_KEY, []).append(queued)
+        return True
+
+    def forget(self, queued: QueuedJob) -> None:
+        """Allow `queued`'s key to be enqueued again."""
+        if queued.key is not None:
+            self._keys.discard(queued.key)
+
+    def push(self, queued: QueuedJob) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait(queued)
+
+    async def start(self) -> None:
+        """Start the workers, first queueing persisted jobs left unfinished."""
+        if self.persistent:
+            await self._recover()
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"job-worker-{i}") for i in range(self.workers)
+        ]
+
+    async def drain(self, timeout: float) -> None:
+        """Finish queued jobs for up to `timeout` seconds, then stop the workers."""
+        if self._queue is not None and self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except TimeoutError:
+                logger.warning("Stopping with %s jobs queued and %s running", self.queued, self.running)
+        # Persisted jobs waiting for a retry run again at the next start
+        for handle in self._retries:
+            handle.cancel()
+        self._retries.clear()
+        self._keys.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def _recover(self) -> None:
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(models.Job).where(models.Job.failed_at.is_(None)).order_by(models.Job.id)
+            )).scalars().all()
+        for row in rows:
+            job_type = _registry.get(row.name)
+            if job_type is None:
+                await self._finish(row.id, f"No handler registered for {row.name!r}")
+                continue
+            queued = QueuedJob(job_type, json.loads(row.payload), row_id=row.id, attempts=row.attempts)
+            if queued.key is not None:
+                self._keys.add(queued.key)
+            self.push(queued)
+        if rows:
+            logger.info("Queued %s unfinished jobs", len(rows))
+
+    async def _work(self) -> None:
+        while True:
+            queued = await self._queue.get()
+            self.running += 1
+            try:
+                await self._run(queued)
+            except Exception:
+                logger.exception("Bookkeeping for job %s failed", queued.type.name)
+            finally:
+                self.running -= 1
+                self._queue.task_done()
+
+    async def _run(self, queued: QueuedJob) -> None:
+        queued.attempts += 1
+        try:
+            await queued.type.handler(**queued.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            if queued.attempts >= settings.jobs_max_attempts:
+                self.failed += 1
+                self.forget(queued)
+                logger.error("Job %s failed after %s attempts", queued.type.name, queued.attempts,
+                             exc_info=exc)
+                if queued.row_id is not None:
+                    await self._finish(queued.row_id, repr(exc))
+                return
+            self.retried += 1
+            delay = settings.jobs_retry_backoff_seconds * 2 ** (queued.attempts - 1)
+            logger.warning("Job %s failed, retrying in %.1fs", queued.type.name, delay, exc_info=exc)
+            if queued.row_id is not None:
+                await self._update(queued.row_id, attempts=queued.attempts, last_error=repr(exc))
+            self._schedule_retry(queued, delay)
+            return
+        self.completed += 1
+        self.forget(queued)
+        if queued.row_id is not None:
+            async with AsyncSessionLocal() as session:
+                await session.execute(delete(models.Job).where(models.Job.id == queued.row_id))
+                await session.commit()
+
+    def _schedule_retry(self, queued: QueuedJob, delay: float) -> None:
+        def retry() -> None:
+            self._retries.discard(handle)
+            self.push(queued)
+
+        handle = asyncio.get_running_loop().call_later(delay, retry)
+        self._retries.add(handle)
+
+    async def _finish(self, row_id: int, error: str) -> None:
+        await self._update(row_id, failed_at=datetime.now(UTC), last_error=error)
+
+    async def _update(self, row_id: int, **values) -> None:
+        async with AsyncSessionLocal() as session:
+            await session.execute(update(models.Job).where(models.Job.id == row_id).values(**values))
+            await session.commit()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self.queued,
+            "running": self.running,
+            "retry_scheduled": len(self._retries),
+            "completed": self.completed,
+            "failed": self.failed,
+            "retried": self.retried,
+            "rejected": self.rejected,
+        }
+
+
+job_queue = JobQueue(
+    workers=settings.jobs_workers,
+    max_queued=settings.jobs_queue_size,
+    persistent=settings.jobs_persistent,
+)
+enqueue = job_queue.enqueue
+
+
+@event.listens_for(Session, "after_commit")
+def _push_committed_jobs(session: Session) -> None:
+    for queued in session.info.pop(PENDING_KEY, ()):
+        if queued.row is not None:
+            queued.row_id, queued.row = queued.row.id, None
+        job_queue.push(queued)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_jobs(session: Session) -> None:
+    for queued in session.info.pop(PENDING_KEY, ()):
+        job_queue.forget(queued)
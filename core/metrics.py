@@ -0,0 +1,271 @@
+"""Request and database instrumentation, exported in Prometheus text format.
+
+Everything here is plain dicts keyed by label tuples and updated from the
+event loop, so recording a request costs a few dictionary operations. It is
+only installed when `settings.metrics_enabled` is set.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.broadcast import broadcaster
+from core.cache import cache_stats
+from core.jobs import job_queue
+from core.security import password_executor
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, _format_labels(self.labels, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: tuple, value: float) -> None:
+        self.values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: [count per bucket (+Inf last), sum, count]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                yield (
+                    f"{self.name}_bucket",
+                    _format_labels(self.labels, labels, f'le="{bound}"'),
+                    cumulative,
+                )
+            yield f"{self.name}_sum", _format_labels(self.labels, labels), total
+            yield f"{self.name}_count", _format_labels(self.labels, labels), count
+
+
+requests_total = Counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to send the full response.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+response_size = Histogram(
+    "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS
+)
+requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests currently being handled.", ("method", "route")
+)
+db_statements = Histogram(
+    "db_statements_per_request", "SQL statements executed per request.",
+    ("method", "route"), COUNT_BUCKETS,
+)
+db_time = Histogram(
+    "db_time_seconds_per_request", "Total time spent in SQL statements per request.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+cache_stat = Gauge(
+    "cache_stat", "In-process cache size and hit/miss/eviction counters.", ("cache", "stat")
+)
+password_hash_pending = Gauge(
+    "password_hash_pending", "Password hashes running or queued on the executor."
+)
+password_hash_rejected = Gauge(
+    "password_hash_rejected", "Password hashes refused because the queue was full."
+)
+job_queue_stat = Gauge(
+    "job_queue_stat", "Background job queue depth and completed/failed/retried counters.", ("stat",)
+)
+live_feed_stat = Gauge(
+    "live_feed_stat", "Live feed subscribers and published/dropped counters.", ("stat",)
+)
+
+METRICS = [
+    requests_total, request_duration, response_size, requests_in_flight,
+    db_statements, db_time, cache_stat, password_hash_pending, password_hash_rejected,
+    job_queue_stat, live_feed_stat,
+]
+
+
+def register_metric(metric) -> None:
+    """Export a metric defined elsewhere on the /metrics endpoint."""
+    METRICS.append(metric)
+
+
+@dataclass
+class RequestStats:
+    method: str
+    route: str = "<unmatched>"
+    statements: int = 0
+    db_seconds: float = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+# Scopes of requests being handled. Routing records the matched route in the
+# shared scope, so in-flight requests are labelled when metrics are rendered
+# rather than on entry, when the route isn't known yet.
+_in_flight: dict[int, Scope] = {}
+
+
+def route_label(scope: Scope) -> str:
+    """The route template a request matched, e.g. /api/posts/{post_id}."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mounts (static, media) don't set "route" but extend root_path
+    mount = scope.get("root_path", "")
+    if mount:
+        return f"{mount}/*"
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route request metrics."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(method=scope["method"])
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        body_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, body_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # Routing has happened by now and updated the shared scope
+                stats.route = route_label(scope)
+            elif message["type"] == "http.response.body":
+                body_bytes += len(message.get("body", b""))
+            await send(message)
+
+        _in_flight[id(scope)] = scope
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            del _in_flight[id(scope)]
+            current_request.reset(token)
+            if stats.route == "<unmatched>":
+                stats.route = route_label(scope)
+            labels = (stats.method, stats.route)
+            requests_total.inc((stats.method, stats.route, str(status_code)))
+            request_duration.observe(labels, time.perf_counter() - start)
+            response_size.observe(labels, body_bytes)
+            db_statements.observe(labels, stats.statements)
+            db_time.observe(labels, stats.db_seconds)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Count statements and DB time against the request that issued them."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+
+def count_in_flight() -> None:
+    counts = dict.fromkeys(requests_in_flight.values, 0)
+    for scope in list(_in_flight.values()):
+        labels = (scope["method"], route_label(scope))
+        counts[labels] = counts.get(labels, 0) + 1
+    requests_in_flight.values = counts
+
+
+def render() -> str:
+    count_in_flight()
+    for name, stats in cache_stats().items():
+        for stat, value in stats.items():
+            cache_stat.set((name, stat), value)
+    password_hash_pending.set((), password_executor.pending)
+    password_hash_rejected.set((), password_executor.rejected)
+    for stat, value in job_queue.stats().items():
+        job_queue_stat.set((stat,), value)
+    for stat, value in broadcaster.stats().items():
+        live_feed_stat.set((stat,), value)
+
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
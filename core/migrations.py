@@ -0,0 +1,300 @@
+"""Versioned schema migrations for the SQLite database.
+
+`migrate_database` runs at startup. Its fast path is one lookup in
+`schema_version`: when the database is already at `SCHEMA_VERSION`, nothing
+is reflected, locked or written. Otherwise the process takes an exclusive
+lock on a file next to the database, so when several workers start at once
+one of them migrates and the others wait and then find the version current.
+
+A new database gets the current schema from the models in one step. An
+existing one runs each migration it hasn't recorded, in its own
+transaction together with its `schema_version` row. Migrations check for
+what they add, so databases created by `create_all` at any earlier revision
+(before `schema_version` existed) are brought up to date as well.
+
+    python -m core.migrations            # migrate now
+    python -m core.migrations --status
+"""
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+import models
+from core.search import create_search_index
+from database import Base
+
+try:
+    import fcntl
+except ImportError:  # Windows; BEGIN IMMEDIATE still serializes the writers
+    fcntl = None
+
+logger = logging.getLogger("blog.migrations")
+
+NOW = "strftime('%Y-%m-%d %H:%M:%S.000000', 'now')"
+BACKFILL_BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+def _has_table(connection: Connection, name: str) -> bool:
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).first() is not None
+
+
+def _columns(connection: Connection, table: str) -> set[str]:
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def _add_updated_at(connection: Connection) -> None:
+    for table, initial in (("users", NOW), ("posts", "date_posted")):
+        if "updated_at" in _columns(connection, table):
+            continue
+        # ADD COLUMN ... NOT NULL needs a constant default; real values follow
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME NOT NULL "
+            "DEFAULT '1970-01-01 00:00:00.000000'"
+        )
+        connection.exec_driver_sql(f"UPDATE {table} SET updated_at = {initial}")
+
+
+def _add_post_excerpt(connection: Connection) -> None:
+    if "excerpt" in _columns(connection, "posts"):
+        return
+    connection.exec_driver_sql(
+        "ALTER TABLE posts ADD COLUMN excerpt VARCHAR(281) NOT NULL DEFAULT ''"
+    )
+    last_id = 0
+    while True:
+        rows = connection.exec_driver_sql(
+            "SELECT id, content FROM posts WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_BATCH_SIZE),
+        ).all()
+        if not rows:
+            return
+        connection.exec_driver_sql(
+            "UPDATE posts SET excerpt = ? WHERE id = ?",
+            [(models.make_excerpt(content), post_id) for post_id, content in rows],
+        )
+        last_id = rows[-1][0]
+
+
+POST_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_posts_id ON posts (id)",
+    "CREATE INDEX IF NOT EXISTS ix_posts_user_id ON posts (user_id)",
+    # Keyset pagination of the feed and of per-author listings
+    "CREATE INDEX IF NOT EXISTS ix_posts_date_posted_id ON posts (date_posted, id)",
+    "CREATE INDEX IF NOT EXISTS ix_posts_user_id_date_posted_id ON posts (user_id, date_posted, id)",
+)
+USER_INDEXES = (
+    # Case-insensitive login and signup lookups
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_lower_username ON users (lower(username))",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_lower_email ON users (lower(email))",
+)
+
+
+def _create_lookup_indexes(connection: Connection) -> None:
+    for statement in (*POST_INDEXES, *USER_INDEXES):
+        connection.exec_driver_sql(statement)
+
+
+def _cascade_user_deletes(connection: Connection) -> None:
+    # SQLite can't alter a foreign key; the table is rebuilt with the same ids
+    foreign_keys = connection.exec_driver_sql("PRAGMA foreign_key_list(posts)").all()
+    if any(row[6] == "CASCADE" for row in foreign_keys):
+        return
+    columns = "id, title, content, excerpt, user_id, date_posted, updated_at"
+    connection.exec_driver_sql("""
+        CREATE TABLE posts_new (
+            id INTEGER NOT NULL,
+            title VARCHAR(100) NOT NULL,
+            content TEXT NOT NULL,
+            excerpt VARCHAR(281) NOT NULL,
+            user_id INTEGER NOT NULL,
+            date_posted DATETIME NOT NULL,
+            updated_at DATETIME NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    """)
+    connection.exec_driver_sql(f"INSERT INTO posts_new ({columns}) SELECT {columns} FROM posts")
+    # Drops the old indexes and search triggers too; version 5 restores the latter
+    connection.exec_driver_sql("DROP TABLE posts")
+    connection.exec_driver_sql("ALTER TABLE posts_new RENAME TO posts")
+    for statement in POST_INDEXES:
+        connection.exec_driver_sql(statement)
+
+
+def _create_jobs_table(connection: Connection) -> None:
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER NOT NULL,
+            name VARCHAR(100) NOT NULL,
+            payload TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            created_at DATETIME NOT NULL,
+            failed_at DATETIME,
+            last_error TEXT,
+            PRIMARY KEY (id)
+        )
+    """)
+
+
+MIGRATIONS = (
+    Migration(1, "Add updated_at to users and posts", _add_updated_at),
+    Migration(2, "Add posts.excerpt", _add_post_excerpt),
+    Migration(3, "Add keyset pagination and case-insensitive lookup indexes", _create_lookup_indexes),
+    Migration(4, "Cascade deletes from users to posts", _cascade_user_deletes),
+    Migration(5, "Add the posts_fts full-text index", create_search_index),
+    Migration(6, "Add the jobs table", _create_jobs_table),
+)
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def current_version(connection: Connection) -> int | None:
+    if not _has_table(connection, "schema_version"):
+        return None
+    return connection.exec_driver_sql("SELECT max(version) FROM schema_version").scalar()
+
+
+def _record(connection: Connection, migration: Migration) -> None:
+    connection.exec_driver_sql(
+        f"INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, {NOW})",
+        (migration.version, migration.description),
+    )
+
+
+def _create_version_table(connection: Connection) -> None:
+    connection.exec_driver_sql("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    """)
+
+
+def stamp(connection: Connection) -> None:
+    """Record every migration as applied, for a schema built from the models."""
+    _create_version_table(connection)
+    for migration in MIGRATIONS:
+        connection.exec_driver_sql(
+            f"INSERT OR IGNORE INTO schema_version (version, description, applied_at) VALUES (?, ?, {NOW})",
+            (migration.version, migration.description),
+        )
+
+
+def migrate(connection: Connection) -> list[Migration]:
+    """Bring the database up to SCHEMA_VERSION; returns what was applied.
+
+    Each step runs in a BEGIN IMMEDIATE transaction: the sqlite3 module
+    would not open one before DDL by itself.
+    """
+    version = current_version(connection)
+    fresh = version is None and not _has_table(connection, "users")
+    connection.commit()
+    if version == SCHEMA_VERSION:
+        return []
+
+    if fresh:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            Base.metadata.create_all(connection)
+            create_search_index(connection)
+            stamp(connection)
+        except Exception:
+            connection.rollback()
+            raise
+        connection.commit()
+        return list(MIGRATIONS)
+
+    if version is None:
+        _create_version_table(connection)
+        connection.commit()
+    applied = []
+    for migration in MIGRATIONS:
+        if version is not None and migration.version <= version:
+            continue
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            migration.apply(connection)
+            _record(connection, migration)
+        except Exception:
+            connection.rollback()
+            raise
+        connection.commit()
+        applied.append(migration)
+    return applied
+
+
+def _lock_path(engine: AsyncEngine) -> str | None:
+    database = engine.url.database
+    if not database or database == ":memory:" or database.startswith("file:"):
+        return None
+    return f"{database}.migrate.lock"
+
+
+@asynccontextmanager
+async def _file_lock(path: str):
+    with open(path, "a") as lock_file:
+        await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+async def migrate_database(engine: AsyncEngine) -> list[Migration]:
+    """Migrate the database behind `engine`, unless it is already current."""
+    if engine.dialect.name != "sqlite":
+        # The migrations are SQLite DDL; other databases get create_all
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        return []
+
+    async with engine.connect() as conn:
+        if await conn.run_sync(current_version) == SCHEMA_VERSION:
+            return []
+
+    path = _lock_path(engine)
+    lock = _file_lock(path) if path and fcntl is not None else nullcontext()
+    async with lock:
+        async with engine.connect() as conn:
+            applied = await conn.run_sync(migrate)
+    for migration in applied:
+        logger.info("Applied migration %s: %s", migration.version, migration.description)
+    return applied
+
+
+async def main(args: argparse.Namespace) -> None:
+    from database import dispose_engines, engine
+
+    try:
+        if args.status:
+            async with engine.connect() as conn:
+                version = await conn.run_sync(current_version)
+            print(f"Database version {version or 0}, latest {SCHEMA_VERSION}")
+            return
+        applied = await migrate_database(engine)
+        for migration in applied:
+            print(f"{migration.version}: {migration.description}")
+        print(f"Database at version {SCHEMA_VERSION}")
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate the database schema.")
+    parser.add_argument("--status", action="store_true", help="print the current version only")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Annotated, Any, Literal, Sequence
+
+from fastapi import HTTPException, Query, Request, status
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, selectinload
+
+import models
+from config import settings
+
+CursorParam = Annotated[str | None, Query(description="Opaque cursor from a previous page.")]
+LimitParam = Annotated[int, Query(ge=1, le=settings.max_page_size)]
+ViewParam = Annotated[
+    Literal["full", "summary"],
+    Query(description="`summary` returns each post's excerpt instead of its content."),
+]
+
+# For listings that only render excerpts: never read `content` from SQLite,
+# and fail loudly rather than lazy-loading it if a template asks for it
+without_content = defer(models.Post.content, raiseload=True)
+
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position in the (date_posted, id) ordering of posts."""
+    date_posted: datetime
+    id: int
+    backwards: bool = False
+
+
+@dataclass
+class Page:
+    items: list[Any]
+    next_cursor: str | None
+    prev_cursor: str | None
+
+
+def encode_cursor(date_posted: datetime, id: int, backwards: bool = False) -> str:
+    payload = [date_posted.isoformat(), id]
+    if backwards:
+        payload.append(1)
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str | None) -> Cursor | None:
+    """Decode an opaque cursor token, raising 400 if it was tampered with."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        return Cursor(
+            date_posted=datetime.fromisoformat(payload[0]),
+            id=int(payload[1]),
+            backwards=len(payload) > 2 and bool(payload[2]),
+        )
+    except (binascii.Error, ValueError, TypeError, IndexError, KeyError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor."
+        )
+
+
+def apply_keyset(stmt: Select, cursor: Cursor | None, limit: int) -> Select:
+    """Restrict a posts query to one page, newest first.
+
+    One extra row is fetched so `build_page` can tell whether another page
+    exists. Backward pages are read in ascending order and flipped afterwards,
+    so both directions are a single range scan on ix_posts_date_posted_id.
+    """
+    key = tuple_(models.Post.date_posted, models.Post.id)
+    if cursor is None:
+        stmt = stmt.order_by(models.Post.date_posted.desc(), models.Post.id.desc())
+    elif cursor.backwards:
+        stmt = (
+            stmt.where(key > tuple_(cursor.date_posted, cursor.id))
+            .order_by(models.Post.date_posted.asc(), models.Post.id.asc())
+        )
+    else:
+        stmt = (
+            stmt.where(key < tuple_(cursor.date_posted, cursor.id))
+            .order_by(models.Post.date_posted.desc(), models.Post.id.desc())
+        )
+    return stmt.limit(limit + 1)
+
+
+def build_page(rows: Sequence[Any], cursor: Cursor | None, limit: int) -> Page:
+    """Turn the rows of an `apply_keyset` query into a page with cursors.
+
+    Rows may be ORM posts or row tuples, as long as they expose `date_posted`
+    and `id`.
+    """
+    items = list(rows[:limit])
+    has_more = len(rows) > limit
+    if cursor is not None and cursor.backwards:
+        items.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, cursor is not None
+
+    next_cursor = prev_cursor = None
+    if items and has_next:
+        last = items[-1]
+        next_cursor = encode_cursor(last.date_posted, last.id)
+    if items and has_prev:
+        first = items[0]
+        prev_cursor = encode_cursor(first.date_posted, first.id, backwards=True)
+    return Page(items=items, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def page_url(request: Request, cursor: str | None, limit: int) -> str | None:
+    if cursor is None:
+        return None
+    return str(request.url.include_query_params(cursor=cursor, limit=limit))
+
+
+def link_header(request: Request, page: Page, limit: int) -> str | None:
+    """Build an RFC 8288 Link header pointing at the neighbouring pages."""
+    links = []
+    for rel, cursor in (("next", page.next_cursor), ("prev", page.prev_cursor)):
+        url = page_url(request, cursor, limit)
+        if url is not None:
+            links.append(f'<{url}>; rel="{rel}"')
+    return ", ".join(links) or None
+
+
+async def load_posts(db: AsyncSession, ids: Sequence[int]) -> list[models.Post]:
+    """Load full posts (with authors) for a page of ids, keeping page order."""
+    if not ids:
+        return []
+    result = await db.execute(
+        select(models.Post)
+        .options(selectinload(models.Post.author))
+        .where(models.Post.id.in_(ids))
+    )
+    posts = {post.id: post for post in result.scalars()}
+    return [posts[id] for id in ids if id in posts]
+
+
+def select_post_versions() -> Select:
+    """Select just the keyset and version columns of posts and their authors.
+
+    This is what conditional GETs hash into an ETag, and it is enough to
+    build the page's cursors without touching post content.
+    """
+    return select(
+        models.Post.id,
+        models.Post.date_posted,
+        models.Post.updated_at,
+        models.User.updated_at.label("author_updated_at"),
+    ).join(models.Post.author)
@@ -0,0 +1,65 @@
+"""Background deletion of users with many posts.
+
+Deleting a user cascades to their posts inside one statement, which holds
+SQLite's write lock for as long as the cascade takes. A purge instead
+deletes the posts in transactions of `purge_chunk_size` rows, pausing
+between them so other writers get the lock, and deletes the user row last.
+Purges run as background jobs (core.jobs), keyed on the user id so that
+deleting a user again while their purge is queued or running reuses it.
+Deleting chunks is idempotent, and the user row goes last, so a purge
+interrupted by a shutdown can be finished by deleting the user again. With
+`jobs_persistent` on, its job is also stored and resumed at the next start;
+by default it is not.
+"""
+import asyncio
+import logging
+
+from sqlalchemy import delete, select
+
+import models
+from config import settings
+from core.cache import page_cache
+from core.jobs import job
+from core.security import invalidate_cached_user
+from database import AsyncSessionLocal
+
+logger = logging.getLogger("blog.purge")
+
+
+async def delete_posts_in_chunks(user_id: int) -> int:
+    """Delete all posts of `user_id`, one bounded transaction at a time."""
+    deleted = 0
+    chunk = (
+        select(models.Post.id)
+        .where(models.Post.user_id == user_id)
+        .limit(settings.purge_chunk_size)
+        .scalar_subquery()
+    )
+    while True:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                delete(models.Post)
+                .where(models.Post.id.in_(chunk))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < settings.purge_chunk_size:
+            return deleted
+        page_cache.invalidate("feed", f"user:{user_id}")
+        await asyncio.sleep(settings.purge_pause_seconds)
+
+
+@job("purge_user", key="user_id")
+async def purge_user(user_id: int) -> None:
+    posts = await delete_posts_in_chunks(user_id)
+    async with AsyncSessionLocal() as session:
+        await session.execute(
+            delete(models.User)
+            .where(models.User.id == user_id)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+    invalidate_cached_user(user_id)
+    page_cache.invalidate("feed", f"user:{user_id}")
+    logger.info("Purged user %s and %s posts", user_id, posts)
@@ -0,0 +1,171 @@
+"""Slow-query log and repeated-query (N+1) detector.
+
+When `settings.query_log_enabled` is set, SQL statements slower than
+`slow_query_threshold_ms` are logged with their parameters, the route that
+issued them and SQLite's EXPLAIN QUERY PLAN. Requests that run the same
+statement shape `query_repeat_threshold` times or more are flagged as
+likely N+1 patterns; executemany batches (bulk inserts) are not counted.
+Findings go to the ``blog.queries`` logger as JSON and to an in-memory ring
+buffer, which `query_log_endpoint_enabled` serves at `query_log_path`.
+
+Only the number of bound parameters is recorded, never their values, which
+include password hashes and email addresses. The endpoint is still
+unauthenticated, so only enable it where statements and timings may be
+seen.
+"""
+import json
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from config import settings
+from core.metrics import route_label
+
+logger = logging.getLogger("blog.queries")
+
+slow_queries: deque[dict] = deque(maxlen=settings.query_log_buffer_size)
+repeated_queries: deque[dict] = deque(maxlen=settings.query_log_buffer_size)
+
+_IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class RequestQueries:
+    scope: Scope
+    shapes: Counter = field(default_factory=Counter)
+
+    @property
+    def method(self) -> str:
+        return self.scope["method"]
+
+    @property
+    def path(self) -> str:
+        return self.scope["path"]
+
+    @property
+    def route(self) -> str:
+        # Routing has already updated the shared scope by the time a
+        # handler or dependency runs a statement
+        return route_label(self.scope)
+
+
+current_queries: ContextVar[RequestQueries | None] = ContextVar("current_queries", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Normalize a statement so queries differing only in IN-list length match."""
+    return _IN_LIST.sub("(?...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _record(buffer: deque, entry: dict) -> None:
+    buffer.append(entry)
+    logger.warning(json.dumps(entry, default=str))
+
+
+def _parameter_count(parameters, executemany: bool) -> int:
+    if executemany:
+        return sum(len(row) for row in parameters)
+    return len(parameters) if parameters else 0
+
+
+def _explain(conn, statement: str, parameters) -> list[str] | None:
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    try:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception:
+        logger.debug("EXPLAIN QUERY PLAN failed", exc_info=True)
+        return None
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+    threshold = settings.slow_query_threshold_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_log_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_log_start"].pop()
+        request = current_queries.get()
+        # Batched inserts repeat one shape by design; they are not N+1s
+        executemany = executemany or (context is not None and context.executemany)
+        if request is not None and not executemany:
+            request.shapes[statement_shape(statement)] += 1
+        if elapsed < threshold:
+            return
+        _record(slow_queries, {
+            "event": "slow_query",
+            "at": datetime.now(UTC).isoformat(),
+            "duration_ms": round(elapsed * 1000, 3),
+            "statement": statement,
+            "parameter_count": _parameter_count(parameters, executemany),
+            "executemany": executemany,
+            "method": request.method if request else None,
+            "route": request.route if request else None,
+            "path": request.path if request else None,
+            "plan": None if executemany else _explain(conn, statement, parameters),
+        })
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_log_start"):
+            connection.info["query_log_start"].pop()
+
+
+class QueryLogMiddleware:
+    """Tracks statement shapes per request and flags repeated ones."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestQueries(scope=scope)
+        token = current_queries.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_queries.reset(token)
+            for shape, count in request.shapes.items():
+                if count >= settings.query_repeat_threshold:
+                    _record(repeated_queries, {
+                        "event": "repeated_query",
+                        "at": datetime.now(UTC).isoformat(),
+                        "method": request.method,
+                        "route": request.route,
+                        "path": request.path,
+                        "count": count,
+                        "statement": shape,
+                    })
+
+
+async def query_log_endpoint(request: Request) -> JSONResponse:
+    return JSONResponse({
+        "slow_query_threshold_ms": settings.slow_query_threshold_ms,
+        "query_repeat_threshold": settings.query_repeat_threshold,
+        "slow_queries": list(slow_queries),
+        "repeated_queries": list(repeated_queries),
+    })
@@ -0,0 +1,188 @@
+"""Token-bucket rate limits, declared per route as dependencies.
+
+    login_limit = RateLimit("login", limit=10, period=60)
+
+    @router.post("/token", dependencies=[Depends(login_limit)])
+
+allows bursts of 10 logins per client IP, refilled at 10 a minute.
+`UserRateLimit` keys the bucket on the authenticated user instead. A
+request over budget gets a 429 with Retry-After before the handler, and
+before any password hashing, runs. Routes without a limit pay nothing.
+
+Buckets live in `rate_limit_store`: in process memory by default, or in a
+SQLite file shared by every worker on the host when `rate_limit_store` is
+"sqlite", so that N workers don't allow N times the budget. Behind a proxy,
+run uvicorn with --proxy-headers so the client IP is the real one.
+"""
+import asyncio
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, Request, status
+
+from config import settings
+from core.metrics import Counter, register_metric
+from core.security import CurrentUser
+
+rate_limited = Counter(
+    "rate_limited_total", "Requests rejected with 429 by a rate limit.", ("limit",)
+)
+register_metric(rate_limited)
+
+
+class MemoryStore:
+    """Buckets in an LRU dict, for a single worker.
+
+    Evicting a bucket refills it, so `maxsize` should comfortably exceed the
+    number of clients active within the longest limit period.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take a token from `key`'s bucket; returns 0, or seconds until one is free."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = capacity
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            self._buckets.move_to_end(key)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        self._buckets[key] = (tokens - 1, now)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def close(self) -> None:
+        self._buckets.clear()
+
+
+class SQLiteStore:
+    """Buckets in a SQLite table, shared by all processes using the same file.
+
+    Each take is a single UPSERT, so concurrent workers never lose updates.
+    Statements run on one dedicated thread that owns the connection.
+    """
+
+    TAKE = """
+        INSERT INTO rate_limits (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:capacity, tokens + (:now - updated) * :rate) - 1,
+            updated = :now
+        WHERE min(:capacity, tokens + (:now - updated) * :rate) >= 1
+        RETURNING tokens
+    """
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limit")
+        self._connection: sqlite3.Connection | None = None
+        # Idle buckets are full again after capacity / rate seconds at most
+        self._horizon = 0.0
+        self._takes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA busy_timeout = 5000")
+            connection.execute("PRAGMA journal_mode = WAL")
+            # Losing the last few updates in a power cut only refills buckets
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                ) WITHOUT ROWID
+            """)
+            self._connection = connection
+        return self._connection
+
+    def _take(self, key: str, capacity: float, rate: float) -> float:
+        connection = self._connect()
+        now = time.time()
+        row = connection.execute(
+            self.TAKE, {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        ).fetchone()
+        self._takes += 1
+        if self._takes % self.PURGE_EVERY == 0:
+            connection.execute("DELETE FROM rate_limits WHERE updated < ?", (now - self._horizon,))
+        if row is not None:
+            return 0.0
+        tokens, updated = connection.execute(
+            "SELECT tokens, updated FROM rate_limits WHERE key = ?", (key,)
+        ).fetchone()
+        return (1 - min(capacity, tokens + (now - updated) * rate)) / rate
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take a token from `key`'s bucket; returns 0, or seconds until one is free."""
+        self._horizon = max(self._horizon, capacity / rate)
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._take, key, capacity, rate
+        )
+
+    def close(self) -> None:
+        def close_connection() -> None:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        self._executor.submit(close_connection).result()
+
+
+def make_store() -> MemoryStore | SQLiteStore:
+    if settings.rate_limit_store == "sqlite":
+        return SQLiteStore(settings.rate_limit_sqlite_path)
+    if settings.rate_limit_store != "memory":
+        raise ValueError(f"Unknown rate_limit_store {settings.rate_limit_store!r}")
+    return MemoryStore(settings.rate_limit_memory_size)
+
+
+rate_limit_store = make_store()
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client is not None else "unknown"
+
+
+class RateLimit:
+    """Dependency allowing `limit` requests per `period` seconds per client IP.
+
+    Up to `limit` requests may arrive at once; after that they are let
+    through at the refill rate of limit / period per second.
+    """
+
+    def __init__(self, name: str, limit: int, period: float):
+        self.name = name
+        self.capacity = limit
+        self.rate = limit / period
+
+    async def check(self, key: str) -> None:
+        if not settings.rate_limit_enabled:
+            return
+        wait = await rate_limit_store.take(f"{self.name}:{key}", self.capacity, self.rate)
+        if wait > 0:
+            rate_limited.inc((self.name,))
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please try again later.",
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    async def __call__(self, request: Request) -> None:
+        await self.check(f"ip:{client_ip(request)}")
+
+
+class UserRateLimit(RateLimit):
+    """Like `RateLimit`, but per authenticated user; requires a bearer token."""
+
+    async def __call__(self, current_user: CurrentUser) -> None:
+        await self.check(f"user:{current_user.id}")
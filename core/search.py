@@ -0,0 +1,197 @@
+"""Full-text search over posts with SQLite FTS5.
+
+`posts_fts` is an external-content FTS5 table over posts.title and
+posts.content: it stores only the inverted index and reads the text back
+from `posts`. Triggers keep it in sync on every insert, delete and
+title/content update, so no handler has to remember to reindex.
+
+Rebuild the index from scratch (e.g. after a bulk import with triggers
+disabled, or if it is ever suspected to be out of sync) with:
+
+    SECRET_KEY=... python -m core.search reindex
+"""
+import argparse
+import asyncio
+import html
+import re
+import time
+from dataclasses import dataclass
+from typing import Annotated
+
+from fastapi import HTTPException, Query, Request, status
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from core.pagination import load_posts
+
+# Private-use markers that cannot appear in escaped output; they are swapped
+# for <mark> tags after the rest of the snippet has been HTML-escaped
+_MARK_START = "\ue000"
+_MARK_END = "\ue001"
+_TOKEN = re.compile(r"\w+")
+
+# bm25 weights for (title, content): a hit in the title counts ten times more
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+SNIPPET_TOKENS = 24
+# Offset pagination gets slower with depth; nobody reads result page 100
+MAX_PAGE = 100
+
+SearchQueryParam = Annotated[str, Query(min_length=1, max_length=200, description="Words to search for.")]
+SearchPageParam = Annotated[int, Query(ge=1, le=MAX_PAGE)]
+
+FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        title, content,
+        content='posts', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    # Only title/content changes touch the index, not updated_at bumps
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+)
+
+SEARCH_SQL = text(f"""
+    SELECT rowid AS id,
+           bm25(posts_fts, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) AS rank,
+           highlight(posts_fts, 0, '{_MARK_START}', '{_MARK_END}') AS title,
+           snippet(posts_fts, 1, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS}) AS snippet
+    FROM posts_fts
+    WHERE posts_fts MATCH :query
+    ORDER BY rank
+    LIMIT :limit OFFSET :offset
+""")
+
+
+@dataclass
+class SearchHit:
+    post: models.Post
+    rank: float
+    title: str
+    snippet: str
+
+
+def create_search_index(connection) -> None:
+    """Create posts_fts and its triggers, indexing existing posts if new."""
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'"
+    ).first()
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if exists is None:
+        rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection) -> None:
+    connection.exec_driver_sql("INSERT INTO posts_fts(posts_fts) VALUES ('rebuild')")
+
+
+def build_match_query(query: str) -> str | None:
+    """Turn free text into an FTS5 query matching all of its words.
+
+    Every word is quoted, so user input can never use (or break on) FTS5
+    operators such as AND, NEAR, column filters or unbalanced quotes.
+    """
+    words = _TOKEN.findall(query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+def render_highlight(value: str) -> str:
+    """HTML-escape an FTS5 highlight/snippet and turn its markers into <mark>."""
+    return (
+        html.escape(value)
+        .replace(_MARK_START, "<mark>")
+        .replace(_MARK_END, "</mark>")
+    )
+
+
+def search_page_url(request: Request, page: int | None, limit: int) -> str | None:
+    if page is None:
+        return None
+    return str(request.url.include_query_params(page=page, limit=limit))
+
+
+def search_link_header(request: Request, page: int, has_next: bool, limit: int) -> str | None:
+    """RFC 8288 Link header for the neighbouring result pages."""
+    links = []
+    neighbours = (("next", page + 1 if has_next else None), ("prev", page - 1 if page > 1 else None))
+    for rel, number in neighbours:
+        url = search_page_url(request, number, limit)
+        if url is not None:
+            links.append(f'<{url}>; rel="{rel}"')
+    return ", ".join(links) or None
+
+
+async def search_posts(
+    db: AsyncSession, query: str, page: int, limit: int
+) -> tuple[list[SearchHit], bool]:
+    """Return one page of posts matching `query`, best match first.
+
+    The second value tells whether another page follows.
+    """
+    match = build_match_query(query)
+    if match is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Search query has no searchable words."
+        )
+    result = await db.execute(
+        SEARCH_SQL, {"query": match, "limit": limit + 1, "offset": (page - 1) * limit}
+    )
+    rows = result.all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    posts = {post.id: post for post in await load_posts(db, [row.id for row in rows])}
+    hits = [
+        SearchHit(
+            post=posts[row.id],
+            rank=row.rank,
+            title=render_highlight(row.title),
+            snippet=render_highlight(row.snippet),
+        )
+        for row in rows
+        if row.id in posts
+    ]
+    return hits, has_next
+
+
+async def reindex() -> None:
+    from core.migrations import migrate_database
+    from database import dispose_engines, engine
+
+    await migrate_database(engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(rebuild_search_index)
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the posts full-text index.")
+    parser.add_argument("command", choices=["reindex"])
+    args = parser.parse_args()
+    started = time.perf_counter()
+    asyncio.run(reindex())
+    print(f"Rebuilt posts_fts in {time.perf_counter() - started:.1f}s")
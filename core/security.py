@@ -1,18 +1,30 @@
+import asyncio
+import time
 import jwt
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from config import settings
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
 from datetime import UTC, datetime, timedelta
 from fastapi.security import OAuth2PasswordBearer
 
-from typing import Annotated
+from typing import Annotated, NoReturn
 from fastapi import Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 import models
 from config import settings
+from core.cache import TTLCache, register_cache
 from database import get_db
 
-password_hash = PasswordHash.recommended()
+password_hash = PasswordHash((
+    Argon2Hasher(
+        time_cost=settings.argon2_time_cost,
+        memory_cost=settings.argon2_memory_cost,
+        parallelism=settings.argon2_parallelism,
+    ),
+))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/token")
 
 def hash_password(password: str) -> str:
@@ -21,6 +33,67 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return password_hash.verify(plain_password, hashed_password)
 
+
+class PasswordExecutor:
+    """Runs Argon2 hashing off the event loop.
+
+    Work goes to a dedicated thread pool (argon2-cffi releases the GIL) or,
+    optionally, a process pool. At most `workers + queue_size` calls may be
+    in flight; beyond that callers get a 503 instead of piling up.
+    """
+
+    def __init__(self, workers: int, queue_size: int, use_processes: bool = False):
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.use_processes = use_processes
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="password-hash",
+                )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_executor = PasswordExecutor(
+    workers=settings.password_hash_workers,
+    queue_size=settings.password_hash_queue_size,
+    use_processes=settings.password_hash_use_processes,
+)
+
+async def hash_password_async(password: str) -> str:
+    return await password_executor.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     "Create a JWT access token. "
     to_encode = data.copy()
@@ -38,8 +111,37 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     )
     return encoded_jwt
 
+# Decoded tokens (token -> subject) and resolved users (id -> column values).
+# Entries never outlive the token's own expiry; users are dropped on update or
+# delete through `invalidate_cached_user`. Both caches are per process, so
+# other workers keep a changed or deleted user for up to auth_cache_ttl;
+# writes that find their user gone call `reject_deleted_user`.
+token_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+user_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+register_cache("auth_tokens", token_cache)
+register_cache("auth_users", user_cache)
+
+def invalidate_cached_user(user_id: int) -> None:
+    user_cache.pop(user_id)
+
+def reject_deleted_user(user_id: int) -> NoReturn:
+    """Refuse a write by a user that no longer exists.
+
+    Only a cached user can get this far, after another worker deleted the
+    account; its cached tokens go too, so later requests fail at auth.
+    """
+    user_cache.pop(user_id)
+    token_cache.discard_values(str(user_id))
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="User not found",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 def verify_access_token(token: str) -> str | None:
     """Verify a JWT access token and return the subject (user id) if valid."""
+    if settings.auth_cache_enabled and (user_id := token_cache.get(token)) is not None:
+        return user_id
     try:
         payload = jwt.decode(
             token,
@@ -53,6 +155,9 @@ def verify_access_token(token: str) -> str | None:
         user_id: str = payload.get("sub")
         if user_id is None:
             return None
+        if settings.auth_cache_enabled:
+            ttl = min(settings.auth_cache_ttl, payload["exp"] - time.time())
+            token_cache.set(token, user_id, ttl=ttl)
         return user_id
     
 async def get_current_user(
@@ -77,6 +182,12 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if settings.auth_cache_enabled and (columns := user_cache.get(user_id_int)) is not None:
+        # Attach a detached copy to this session without querying the database
+        cached_user = models.User(**columns)
+        make_transient_to_detached(cached_user)
+        return await db.merge(cached_user, load=False)
+
     result = await db.execute(
         select(models.User)
         .where(models.User.id == user_id_int)
@@ -88,6 +199,11 @@ async def get_current_user(
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if settings.auth_cache_enabled:
+        user_cache.set(user.id, {
+            column.key: getattr(user, column.key)
+            for column in models.User.__table__.columns
+        })
     return user
 
 CurrentUser = Annotated[models.User, Depends(get_current_user)]
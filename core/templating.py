@@ -0,0 +1,72 @@
+"""The application's single Jinja environment.
+
+Every router renders through `templates`, so templates are loaded and
+compiled once per process. Compiled bytecode is also written to
+`template_cache_dir` (Jinja's per-user temp directory by default), so new
+workers skip compiling the templates altogether.
+
+The environment adds a ``{% cache %}`` tag for fragments that depend only
+on the values they are keyed by, e.g. one post in a listing:
+
+    {% cache "home-post", post.id, post.updated_at, post.author.updated_at, request.base_url|string %}
+      ...
+    {% endcache %}
+
+The key should contain everything that changes the fragment's output; the
+rendered HTML is reused across pages until the key changes or the entry
+expires.
+"""
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from config import settings
+from core.assets import asset_url
+from core.cache import TTLCache, register_cache
+
+fragment_cache = TTLCache(maxsize=settings.fragment_cache_size, ttl=settings.fragment_cache_ttl)
+register_cache("fragments", fragment_cache)
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache key, ... %}body{% endcache %}`` renders `body` once per key."""
+
+    tags = {"cache"}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [nodes.Tuple(key, "load")]), [], [], body
+        ).set_lineno(lineno)
+
+    @staticmethod
+    def _render(key: tuple, caller) -> Markup:
+        if not settings.fragment_cache_enabled:
+            return caller()
+        fragment = fragment_cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            fragment_cache.set(key, fragment)
+        return fragment
+
+
+env = Environment(
+    loader=FileSystemLoader("templates"),
+    autoescape=True,
+    extensions=[FragmentCacheExtension],
+    bytecode_cache=FileSystemBytecodeCache(settings.template_cache_dir),
+)
+env.globals["asset_url"] = asset_url
+
+templates = Jinja2Templates(env=env)
+
+
+def warm_templates() -> None:
+    """Load every template, from the bytecode cache where possible."""
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
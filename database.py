@@ -1,22 +1,102 @@
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./blog.db"
+from config import settings
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+
+def sqlite_pragmas(read_only: bool = False) -> dict[str, str | int]:
+    """The per-connection SQLite pragmas configured in Settings."""
+    pragmas: dict[str, str | int] = {
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "busy_timeout": settings.sqlite_busy_timeout,
+        # Off by default in SQLite; needed for ON DELETE CASCADE
+        "foreign_keys": "ON",
+    }
+    if read_only:
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def make_engine(
+    url: str,
+    *,
+    pool_size: int,
+    max_overflow: int,
+    pragmas: dict[str, str | int] | None = None,
+) -> AsyncEngine:
+    """Create an async engine with an explicitly sized pool.
+
+    For SQLite, `pragmas` are applied to every new DBAPI connection, so a
+    connection comes out of the pool already in WAL mode with a warm cache.
+    """
+    is_sqlite = url.startswith("sqlite")
+    engine = create_async_engine(
+        url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+    )
+    if is_sqlite and pragmas:
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+    return engine
+
+
+engine = make_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pragmas=sqlite_pragmas(),
 )
 
+# Read-only handlers can be given their own pool so a burst of feed reads
+# never waits behind writers for a connection. With WAL, readers on these
+# connections see every committed write.
+if settings.db_read_pool_enabled:
+    read_engine = make_engine(
+        settings.database_read_url or SQLALCHEMY_DATABASE_URL,
+        pool_size=settings.db_read_pool_size,
+        max_overflow=settings.db_read_max_overflow,
+        pragmas=sqlite_pragmas(read_only=True),
+    )
+else:
+    read_engine = engine
+
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
 class Base(DeclarativeBase):
     pass
 
+async def dispose_engines() -> None:
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
 async def get_db():
     async with AsyncSessionLocal() as session:
             yield session
+
+async def get_read_db():
+    async with ReadSessionLocal() as session:
+            yield session
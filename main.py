@@ -4,8 +4,6 @@ from typing import Annotated
 
 # Third-party imports
 from fastapi import FastAPI, Request, HTTPException, Depends
-from fastapi.templating import Jinja2Templates
-from fastapi.staticfiles import StaticFiles
 from fastapi.exceptions import RequestValidationError
 from fastapi.exception_handlers import http_exception_handler
 from sqlalchemy import select
@@ -14,55 +12,129 @@ from sqlalchemy.orm import selectinload
 
 # Local application imports
 import models
-from database import Base, engine, get_db
-from routers.api import users as api_users, posts as api_posts
+from config import settings
+from core.cache import page_cache
+from core.admission import AdmissionMiddleware
+from core.assets import HashedStaticFiles
+from core.broadcast import broadcaster
+from core.compression import CompressionMiddleware
+from core.jobs import job_queue
+from core.ratelimit import rate_limit_store
+from core import purge  # registers the purge_user job
+from core.security import password_executor
+from core.pagination import (
+    CursorParam,
+    LimitParam,
+    apply_keyset,
+    build_page,
+    decode_cursor,
+    page_url,
+    without_content,
+)
+from core.metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+from core import querylog
+from core.migrations import migrate_database
+from core.templating import templates, warm_templates
+from database import (
+    dispose_engines,
+    engine,
+    get_read_db,
+    read_engine,
+)
+from routers.api import users as api_users, posts as api_posts, export as api_export
 from routers.web import users as web_users, posts as web_posts, auth as web_auth
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate_database(engine)
+    warm_templates()
+    await job_queue.start()
     yield
-    await engine.dispose()
+    await job_queue.drain(settings.jobs_drain_timeout)
+    await broadcaster.close()
+    password_executor.shutdown()
+    rate_limit_store.close()
+    await dispose_engines()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Innermost, so shed requests are still counted and timed by the metrics
+# middleware, and only time spent in the app holds a slot
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+
+# Added before the metrics middleware so response sizes are measured on
+# the wire, after compression
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+# Opt-in Prometheus metrics
+if settings.metrics_enabled:
+    instrument_engine(engine)
+    if read_engine is not engine:
+        instrument_engine(read_engine)
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route(settings.metrics_path, metrics_endpoint, include_in_schema=False)
+
+# Opt-in slow-query log and repeated-query detector
+if settings.query_log_enabled:
+    querylog.instrument_engine(engine)
+    if read_engine is not engine:
+        querylog.instrument_engine(read_engine)
+    app.add_middleware(querylog.QueryLogMiddleware)
+    if settings.query_log_endpoint_enabled:
+        app.add_api_route(settings.query_log_path, querylog.query_log_endpoint, include_in_schema=False)
+
 # Include API routers
 app.include_router(api_users.router)
 app.include_router(api_posts.router)
+app.include_router(api_export.router)
 
 # Include Web routers
 app.include_router(web_users.router)
 app.include_router(web_posts.router)
 app.include_router(web_auth.router)
 
-# Mount static and media directories
-app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/media", StaticFiles(directory="media"), name="media")
-
-# Templates setup
-templates = Jinja2Templates(directory="templates")
+# Mount static and media directories; ?v=<hash> URLs from asset_url are
+# served as immutable
+app.mount("/static", HashedStaticFiles(directory="static"), name="static")
+app.mount("/media", HashedStaticFiles(directory="media"), name="media")
 
 
 @app.get("/", include_in_schema=False, name="home")
 @app.get("/posts", include_in_schema=False, name="posts")
-async def home(request: Request, db: Annotated[AsyncSession, Depends(get_db)]):
+async def home(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    cursor: CursorParam = None,
+    limit: LimitParam = settings.page_size,
+):
+    if (cached := page_cache.get(request)) is not None:
+        return cached
+
+    position = decode_cursor(cursor)
     result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .order_by(models.Post.date_posted.desc())
+        apply_keyset(
+            select(models.Post).options(selectinload(models.Post.author), without_content),
+            position,
+            limit,
+        )
     )
-    posts = result.scalars().all()
-    return templates.TemplateResponse(
+    page = build_page(result.scalars().all(), position, limit)
+    response = templates.TemplateResponse(
         request, 
         'home.html', 
         {
             "request": request, 
-            "posts": posts,
+            "posts": page.items,
+            "next_url": page_url(request, page.next_cursor, limit),
+            "prev_url": page_url(request, page.prev_cursor, limit),
             "title": "Home Page"
         }
     )
+    page_cache.store(request, response, tags=["feed"])
+    return response
 
 
 
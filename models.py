@@ -1,10 +1,34 @@
 
 from __future__ import annotations
 from datetime import UTC, datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
-from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, func
+from sqlalchemy.orm import relationship, Mapped, mapped_column, validates
 from database import Base
 
+EXCERPT_LENGTH = 280
+
+
+def make_excerpt(content: str, length: int = EXCERPT_LENGTH) -> str:
+    """The first `length` characters of a post, cut at a word boundary."""
+    text = " ".join(content.split())
+    if len(text) <= length:
+        return text
+    cut = text.rfind(" ", 0, length)
+    return text[:cut if cut > 0 else length].rstrip() + "…"
+
+
+def profile_image_path(image_file: str | None) -> str:
+    if image_file:
+        return f"/media/profile_pics/{image_file}"
+
+    return "/static/profile_pics/default.jpg"
+
+
+def _excerpt_default(context) -> str:
+    # Covers Core inserts (bulk loads) that bypass the ORM validator below
+    return make_excerpt(context.get_current_parameters()["content"])
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -13,27 +37,50 @@ class User(Base):
     email: Mapped[str] = mapped_column(String(120), unique=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(String(200), nullable=False)
     image_file: Mapped[str | None] = mapped_column(String(200), nullable=True, default=None)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+        nullable=False
+    )
 
+    # The database deletes a user's posts (ON DELETE CASCADE); the ORM must
+    # not load them just to delete them one by one
     posts: Mapped[list[Post]] = relationship(
         back_populates="author",
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        passive_deletes=True
     )
 
     @property
     def image_path(self) -> str:
-        if self.image_file:
-            return f"/media/profile_pics/{self.image_file}"
-        
-        return "/static/profile_pics/default.jpg"
+        return profile_image_path(self.image_file)
+
+# Logins and signups look users up case-insensitively; these expression
+# indexes match `func.lower(...) == value` filters exactly, and being unique
+# they also stop two concurrent signups from claiming the same name.
+Index("ix_users_lower_username", func.lower(User.username), unique=True)
+Index("ix_users_lower_email", func.lower(User.email), unique=True)
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Serve the keyset-paginated feed and per-author listings
+        Index("ix_posts_date_posted_id", "date_posted", "id"),
+        Index("ix_posts_user_id_date_posted_id", "user_id", "date_posted", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     title: Mapped[str] = mapped_column(String(100), nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
+    # Precomputed so listings can skip loading `content` altogether
+    excerpt: Mapped[str] = mapped_column(
+        String(EXCERPT_LENGTH + 1),
+        default=_excerpt_default,
+        nullable=False
+    )
     user_id: Mapped[int] = mapped_column(
-        ForeignKey("users.id"), 
+        ForeignKey("users.id", ondelete="CASCADE"), 
         nullable=False, 
         index=True
     )
@@ -42,4 +89,32 @@ class Post(Base):
         default=lambda: datetime.now(UTC), 
         nullable=False
     )
-    author: Mapped[User] = relationship(back_populates="posts")
\ No newline at end of file
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+        nullable=False
+    )
+    author: Mapped[User] = relationship(back_populates="posts")
+
+    @validates("content")
+    def _update_excerpt(self, key: str, content: str) -> str:
+        self.excerpt = make_excerpt(content)
+        return content
+
+
+class Job(Base):
+    """A persisted background job (see core.jobs), deleted once it succeeds."""
+    __tablename__ = "jobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(100), nullable=False)
+    payload: Mapped[str] = mapped_column(Text, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        nullable=False
+    )
+    failed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -0,0 +1,100 @@
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Callable
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import Select, tuple_
+
+import models
+from config import settings
+from core.ratelimit import RateLimit
+from core.serialization import (
+    post_adapter,
+    post_from_row,
+    select_post_rows,
+    select_user_rows,
+    user_adapter,
+    user_from_row,
+)
+from database import ReadSessionLocal
+
+
+# A full export streams the whole table; one budget covers both endpoints
+export_limit = RateLimit("export", limit=10, period=60)
+
+router = APIRouter(
+    prefix="/api/export",
+    tags=["Export"],
+    dependencies=[Depends(export_limit)],
+)
+
+NDJSON = "application/x-ndjson"
+
+
+async def stream_ndjson(
+    stmt: Select, to_model: Callable, adapter: TypeAdapter, gzip: bool
+) -> AsyncIterator[bytes]:
+    """Yield `stmt`'s rows as NDJSON, one server-side cursor batch at a time.
+
+    The generator opens its own session: it runs after the handler has
+    returned, when request-scoped dependencies may already be closed.
+    """
+    # wbits=31 writes a gzip header and trailer rather than a raw zlib stream
+    compressor = zlib.compressobj(wbits=31) if gzip else None
+    async with ReadSessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=settings.export_batch_size))
+        async for batch in result.partitions():
+            chunk = b"".join(adapter.dump_json(to_model(row)) + b"\n" for row in batch)
+            if compressor is None:
+                yield chunk
+            elif compressed := compressor.compress(chunk):
+                yield compressed
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def export_response(stream: AsyncIterator[bytes], name: str, gzip: bool) -> StreamingResponse:
+    if gzip:
+        return StreamingResponse(
+            stream,
+            media_type="application/gzip",
+            headers={"Content-Disposition": f'attachment; filename="{name}.ndjson.gz"'},
+        )
+    return StreamingResponse(stream, media_type=NDJSON)
+
+
+@router.get("/posts", response_class=StreamingResponse, responses={200: {"content": {NDJSON: {}}}})
+async def export_posts(
+    since: datetime | None = Query(None, description="Only posts after this date_posted."),
+    since_id: int = Query(0, ge=0, description="With `since`, the id of the last post already exported."),
+    gzip: bool = Query(False, description="Return a gzip-compressed .ndjson.gz file."),
+):
+    """Every post as one PostResponse JSON object per line, oldest first.
+
+    For an incremental export pass the `date_posted` and `id` of the last
+    line of the previous export as `since` and `since_id`.
+    """
+    stmt = select_post_rows().order_by(models.Post.date_posted.asc(), models.Post.id.asc())
+    if since is not None:
+        stmt = stmt.where(tuple_(models.Post.date_posted, models.Post.id) > tuple_(since, since_id))
+    return export_response(
+        stream_ndjson(stmt, post_from_row, post_adapter, gzip), "posts", gzip
+    )
+
+
+@router.get("/users", response_class=StreamingResponse, responses={200: {"content": {NDJSON: {}}}})
+async def export_users(
+    since_id: int = Query(0, ge=0, description="Only users with a greater id."),
+    gzip: bool = Query(False, description="Return a gzip-compressed .ndjson.gz file."),
+):
+    """Every user as one UserPublic JSON object per line, by id."""
+    stmt = (
+        select_user_rows()
+        .where(models.User.id > since_id)
+        .order_by(models.User.id.asc())
+    )
+    return export_response(
+        stream_ndjson(stmt, user_from_row, user_adapter, gzip), "users", gzip
+    )
@@ -1,12 +1,47 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select
+from typing import Annotated, NoReturn
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import models
-from database import get_db
-from schemas import PostCreate, PostResponse, PostUpdate
-from core.security import CurrentUser
+from config import settings
+from database import get_db, get_read_db
+from schemas import (
+    BulkPostResult,
+    PostBulkEvent,
+    PostCreate,
+    PostEvent,
+    PostResponse,
+    PostSearchResult,
+    PostSummary,
+    PostUpdate,
+)
+from core.broadcast import broadcaster
+from core.bulk import NDJSON_TYPES, parse_bulk_posts
+from core.security import CurrentUser, reject_deleted_user
+from core.cache import page_cache
+from core.jobs import enqueue
+from core.conditional import conditional_response, make_etag
+from core.ratelimit import UserRateLimit
+from core.pagination import (
+    CursorParam,
+    LimitParam,
+    ViewParam,
+    apply_keyset,
+    build_page,
+    decode_cursor,
+    link_header,
+    select_post_versions,
+)
+from core.serialization import (
+    json_response,
+    load_post_rows,
+    post_list_adapter,
+    post_summary_list_adapter,
+)
+from core.search import SearchPageParam, SearchQueryParam, search_link_header, search_posts
 
 
 router = APIRouter(
@@ -14,19 +49,86 @@ router = APIRouter(
     tags=["Posts"]
 )
 
+create_post_limit = UserRateLimit("create_post", limit=30, period=60)
+bulk_posts_limit = UserRateLimit("bulk_posts", limit=5, period=60)
 
-@router.get("", response_model=list[PostResponse])
-async def get_posts_api(db: Annotated[AsyncSession, Depends(get_db)]):
-    result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .order_by(models.Post.date_posted.desc())
+
+@router.get("", response_model=list[PostResponse] | list[PostSummary])
+async def get_posts_api(
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    cursor: CursorParam = None,
+    limit: LimitParam = settings.page_size,
+    view: ViewParam = "full",
+):
+    position = decode_cursor(cursor)
+    result = await db.execute(apply_keyset(select_post_versions(), position, limit))
+    page = build_page(result.all(), position, limit)
+    if links := link_header(request, page, limit):
+        response.headers["Link"] = links
+
+    etag = make_etag("posts", view, [tuple(row) for row in page.items])
+    if (not_modified := conditional_response(request, response, etag)) is not None:
+        return not_modified
+
+    ids = [row.id for row in page.items]
+    if view == "summary":
+        return json_response(
+            post_summary_list_adapter, await load_post_rows(db, ids, summary=True), response
+        )
+    return json_response(post_list_adapter, await load_post_rows(db, ids), response)
+
+
+@router.get("/search", response_model=list[PostSearchResult])
+async def search_posts_api(
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    q: SearchQueryParam,
+    page: SearchPageParam = 1,
+    limit: LimitParam = settings.page_size,
+):
+    hits, has_next = await search_posts(db, q, page, limit)
+    if links := search_link_header(request, page, has_next, limit):
+        response.headers["Link"] = links
+    return hits
+
+
+@router.get(
+    "/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/event-stream": {}}}},
+)
+async def stream_posts(
+    last_event_id: Annotated[str | None, Header(description="Resume after this event id.")] = None,
+):
+    """Live post events as Server-Sent Events.
+
+    Events are `post.created`, `post.updated`, `post.deleted` and
+    `post.bulk_created`, with a compact JSON payload. A `reset` event means
+    events were missed and the client should reload the feed.
+    """
+    subscription = broadcaster.subscribe(last_event_id)
+    if subscription is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many live feed subscribers, try again later.",
+            headers={"Retry-After": str(settings.sse_retry_ms // 1000 or 1)},
+        )
+    return StreamingResponse(
+        subscription.frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    posts = result.scalars().all()
-    return posts
 
 
-@router.post("", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "",
+    response_model=PostResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(create_post_limit)],
+)
 async def create_post(
     post: PostCreate, 
     current_user: CurrentUser, 
@@ -39,37 +141,116 @@ async def create_post(
     )
 
     db.add(new_post)
+    try:
+        await db.flush()
+    except IntegrityError:
+        # The only foreign key is the author, deleted through another worker
+        await db.rollback()
+        reject_deleted_user(new_post.user_id)
+    enqueue(db, "broadcast", event="post.created", data=PostEvent(
+        id=new_post.id,
+        user_id=new_post.user_id,
+        title=new_post.title,
+        excerpt=new_post.excerpt,
+        date_posted=new_post.date_posted,
+    ).model_dump_json())
     await db.commit()
+    page_cache.invalidate("feed", f"user:{current_user.id}")
     await db.refresh(new_post, attribute_names=["author"])
     return new_post
 
 
+@router.post(
+    "/bulk",
+    response_model=BulkPostResult,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(bulk_posts_limit)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/PostCreate"}}
+                },
+                **{media_type: {"schema": {"type": "string"}} for media_type in NDJSON_TYPES},
+            },
+        }
+    },
+)
+async def create_posts_bulk(
+    request: Request,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    atomic: bool = Query(False, description="Create nothing if any item is invalid."),
+):
+    """Create many posts in one transaction from a JSON array or NDJSON.
+
+    Invalid items are reported by position and skipped, unless `atomic`
+    is set, in which case the whole batch is rejected with 422.
+    """
+    items = parse_bulk_posts(await request.body(), request.headers.get("content-type", ""))
+    if items.errors and atomic:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=items.errors
+        )
+
+    ids: list[int] = []
+    rows = [
+        {"title": post.title, "content": post.content, "user_id": current_user.id}
+        for _, post in items.valid
+    ]
+    # sort_by_parameter_order would make SQLite insert row by row. Each chunk
+    # is one multi-row INSERT instead, and SQLite hands out rowids in
+    # increasing order within it, so sorted ids are in input order.
+    stmt = insert(models.Post).returning(models.Post.id)
+    chunk_size = settings.bulk_insert_chunk_size
+    try:
+        for start in range(0, len(rows), chunk_size):
+            result = await db.execute(stmt, rows[start:start + chunk_size])
+            ids.extend(sorted(result.scalars()))
+    except IntegrityError:
+        await db.rollback()
+        reject_deleted_user(rows[0]["user_id"])
+    if ids:
+        enqueue(
+            db, "broadcast",
+            event="post.bulk_created",
+            data=PostBulkEvent(user_id=current_user.id, ids=ids).model_dump_json(),
+        )
+    await db.commit()
+    if ids:
+        page_cache.invalidate("feed", f"user:{current_user.id}")
+    return BulkPostResult(created=len(ids), ids=ids, errors=items.errors)
+
+
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post_detail_api(post_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
+async def get_post_detail_api(
+    post_id: int,
+    request: Request,
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+):
     result = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
+        select_post_versions()
         .where(models.Post.id == post_id)
-    ) 
-    post = result.scalars().first()
+    )
+    version = result.first()
 
-    if not post:
+    if not version:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Post with ID {post_id} not found."
         )
-    return post
 
+    etag = make_etag("post", tuple(version))
+    last_modified = max(version.updated_at, version.author_updated_at)
+    if (not_modified := conditional_response(request, response, etag, last_modified)) is not None:
+        return not_modified
 
-@router.put("/{post_id}", response_model=PostResponse)
-async def update_post_full(
-    post_id: int,
-    post_data: PostUpdate,
-    current_user: CurrentUser,
-    db: Annotated[AsyncSession, Depends(get_db)], 
-):
     result = await db.execute(
         select(models.Post)
+        .options(selectinload(models.Post.author))
         .where(models.Post.id == post_id)
     ) 
     post = result.scalars().first()
@@ -79,19 +260,85 @@ async def update_post_full(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Post with ID {post_id} not found."
         )
-    
-    if post.user_id != current_user.id:
+    return post
+
+
+async def raise_missing_or_forbidden(
+    db: AsyncSession, post_id: int, user_id: int, action: str
+) -> NoReturn:
+    """Explain why a write filtered on (id, user_id) matched no row."""
+    # A cached user may have been deleted by another worker meanwhile
+    if (await db.execute(select(models.User.id).where(models.User.id == user_id))).first() is None:
+        reject_deleted_user(user_id)
+    result = await db.execute(select(models.Post.id).where(models.Post.id == post_id))
+    if result.first() is None:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to update this post."
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Post with ID {post_id} not found."
         )
-        
-    post.title = post_data.title
-    post.content = post_data.content
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=f"You do not have permission to {action} this post."
+    )
+
 
+async def update_own_post(
+    db: AsyncSession, post_id: int, current_user: models.User, values: dict
+) -> dict:
+    """Update a post of `current_user` in one UPDATE ... RETURNING statement.
+
+    Ownership is part of the WHERE clause, so nothing is read first and the
+    write lock is held only for the statement and the commit. SQLite's
+    RETURNING cannot include joined tables; the author is `current_user`
+    by construction.
+    """
+    if values.get("content") is not None:
+        values["excerpt"] = models.make_excerpt(values["content"])
+    columns = (
+        models.Post.id,
+        models.Post.title,
+        models.Post.content,
+        models.Post.user_id,
+        models.Post.date_posted,
+    )
+    owned = (models.Post.id == post_id, models.Post.user_id == current_user.id)
+    if values:
+        result = await db.execute(
+            update(models.Post)
+            .where(*owned)
+            .values(**values)
+            .returning(*columns)
+            .execution_options(synchronize_session=False)
+        )
+    else:
+        result = await db.execute(select(*columns).where(*owned))
+    row = result.first()
+    if row is None:
+        await raise_missing_or_forbidden(db, post_id, current_user.id, "update")
+
+    if values:
+        enqueue(db, "broadcast", event="post.updated", data=PostEvent(
+            id=row.id,
+            user_id=row.user_id,
+            title=row.title,
+            excerpt=models.make_excerpt(row.content),
+            date_posted=row.date_posted,
+        ).model_dump_json())
     await db.commit()
-    await db.refresh(post, attribute_names=["author"])
-    return post
+    page_cache.invalidate("feed", f"post:{post_id}", f"user:{current_user.id}")
+    return {**row._mapping, "author": current_user}
+
+
+@router.put("/{post_id}", response_model=PostResponse)
+async def update_post_full(
+    post_id: int,
+    post_data: PostUpdate,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)], 
+):
+    return await update_own_post(
+        db, post_id, current_user, {"title": post_data.title, "content": post_data.content}
+    )
 
 
 @router.patch("/{post_id}", response_model=PostResponse)
@@ -101,31 +348,9 @@ async def update_post_partial(
     current_user: CurrentUser,
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    result = await db.execute(
-        select(models.Post)
-        .where(models.Post.id == post_id)
-    ) 
-    post = result.scalars().first()
-
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Post with ID {post_id} not found."
-        )
-    
-    if post.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to update this post."
-        )
-    
-    update_data = post_data.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(post, key, value)
-
-    await db.commit()
-    await db.refresh(post, attribute_names=["author"])
-    return post
+    return await update_own_post(
+        db, post_id, current_user, post_data.model_dump(exclude_unset=True)
+    )
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -134,21 +359,18 @@ async def delete_post_detail_api(
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
     result = await db.execute(
-        select(models.Post)
-        .where(models.Post.id == post_id)
+        delete(models.Post)
+        .where(models.Post.id == post_id, models.Post.user_id == current_user.id)
+        .returning(models.Post.id)
+        .execution_options(synchronize_session=False)
     )
-    post = result.scalars().first() 
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Post with ID {post_id} not found."
-        )
-    
-    if post.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You do not have permission to delete this post."
-        )
+    if result.first() is None:
+        await raise_missing_or_forbidden(db, post_id, current_user.id, "delete")
 
-    await db.delete(post)
+    enqueue(
+        db, "broadcast",
+        event="post.deleted",
+        data=PostEvent(id=post_id, user_id=current_user.id).model_dump_json(exclude_none=True),
+    )
     await db.commit()
+    page_cache.invalidate("feed", f"post:{post_id}", f"user:{current_user.id}")
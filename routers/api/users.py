@@ -1,29 +1,54 @@
 from datetime import timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 
-from sqlalchemy import select, func
+from sqlalchemy import delete, select, func, or_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 import models
 from core.security import (
-    hash_password, 
-    verify_password, 
+    hash_password_async, 
+    verify_password_async, 
     create_access_token,
+    invalidate_cached_user,
+    reject_deleted_user,
     CurrentUser
 )
+from core.cache import page_cache
+from core.jobs import enqueue
+from core.ratelimit import RateLimit, UserRateLimit
+from core.conditional import conditional_response, make_etag
+from core.pagination import (
+    CursorParam,
+    LimitParam,
+    ViewParam,
+    apply_keyset,
+    build_page,
+    decode_cursor,
+    link_header,
+    select_post_versions,
+)
+from core.serialization import (
+    json_response,
+    load_post_rows,
+    load_user_rows,
+    post_list_adapter,
+    post_summary_list_adapter,
+    user_list_adapter,
+)
 from config import settings
-from database import get_db
+from database import get_db, get_read_db
 from schemas import (
     UserCreate, 
     UserUpdate,     
     UserPublic, 
     UserPrivate, 
     Token, 
-    PostResponse
+    PostResponse,
+    PostSummary
 )
 
 
@@ -33,47 +58,78 @@ router = APIRouter(
 )
 
 DB =  Annotated[AsyncSession, Depends(get_db)]
+ReadDB = Annotated[AsyncSession, Depends(get_read_db)]
 
-@router.post("", response_model=UserPrivate, status_code=status.HTTP_201_CREATED) 
-async def create_user(user: UserCreate, db: DB):
-    result = await db.execute(
-        select(models.User)
-        .where(func.lower(models.User.username) == user.username.lower())
-    )
+# Argon2 makes logins and signups the cheapest way to tie up a worker
+login_limit = RateLimit("login", limit=10, period=60)
+signup_limit = RateLimit("signup", limit=5, period=600)
+update_user_limit = UserRateLimit("update_user", limit=10, period=60)
 
-    existing_user = result.scalars().first()
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"User with that {user.username} already exists."
-        )
-    
-    result = await db.execute(
-        select(models.User)
-        .where(func.lower(models.User.email) == user.email.lower())
-    )
+async def find_taken_identity(
+    db: AsyncSession,
+    username: str | None,
+    email: str | None,
+    exclude_user_id: int | None = None,
+) -> str | None:
+    """Return the username or email already used by another account, if any.
+
+    Both checks run as one query; SQLite answers the OR from the two
+    lower() expression indexes on users.
+    """
+    conditions = []
+    if username is not None:
+        conditions.append(func.lower(models.User.username) == username.lower())
+    if email is not None:
+        conditions.append(func.lower(models.User.email) == email.lower())
+    if not conditions:
+        return None
+
+    stmt = select(models.User.username, models.User.email).where(or_(*conditions))
+    if exclude_user_id is not None:
+        stmt = stmt.where(models.User.id != exclude_user_id)
+    rows = (await db.execute(stmt.limit(2))).all()
 
-    existing_email = result.scalars().first()
+    if username is not None and any(row.username.lower() == username.lower() for row in rows):
+        return username
+    if rows:
+        return email
+    return None
 
-    if existing_email:
+@router.post(
+    "",
+    response_model=UserPrivate,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(signup_limit)],
+)
+async def create_user(user: UserCreate, db: DB):
+    taken = await find_taken_identity(db, user.username, user.email)
+    if taken:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"User with that {user.email} already exists."
+            detail=f"User with that {taken} already exists."
         )
     
     new_user = models.User(
         username=user.username,
         email = user.email.lower(),
-        password_hash=hash_password(user.password)
+        password_hash=await hash_password_async(user.password)
     )
 
     db.add(new_user)
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent signup for the same name or email
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User with that username or email already exists."
+        )
     await db.refresh(new_user)
 
     return new_user
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[Depends(login_limit)])
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], 
     db: DB
@@ -84,7 +140,7 @@ async def login_for_access_token(
     )
     user = result.scalars().first() 
 
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials.",
@@ -104,7 +160,22 @@ async def get_current_user(current_user: CurrentUser):
 
 
 @router.get("/{user_id}", response_model=UserPublic)
-async def get_user(user_id: int, db: DB):
+async def get_user(user_id: int, request: Request, response: Response, db: ReadDB):
+    result = await db.execute(
+        select(models.User.updated_at)
+        .where(models.User.id == user_id)
+    )
+    updated_at = result.scalar()
+    if updated_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with ID {user_id} not found."
+        )
+
+    etag = make_etag("user", user_id, updated_at)
+    if (not_modified := conditional_response(request, response, etag, updated_at)) is not None:
+        return not_modified
+
     result = await db.execute(
         select(models.User)
         .where(models.User.id == user_id)
@@ -119,39 +190,57 @@ async def get_user(user_id: int, db: DB):
 
 
 @router.get("", response_model=list[UserPublic])
-async def get_users(db: DB):
-    result = await db.execute(
-        select(models.User)
-        .order_by(models.User.id.asc())
-    )
-    users = result.scalars().all()
-    return users
+async def get_users(db: ReadDB):
+    return json_response(user_list_adapter, await load_user_rows(db))
 
 
-@router.get("/{user_id}/posts", response_model=list[PostResponse])
-async def get_user_posts(user_id: int, db: DB):
+@router.get("/{user_id}/posts", response_model=list[PostResponse] | list[PostSummary])
+async def get_user_posts(
+    user_id: int,
+    request: Request,
+    response: Response,
+    db: ReadDB,
+    cursor: CursorParam = None,
+    limit: LimitParam = settings.page_size,
+    view: ViewParam = "full",
+):
+    position = decode_cursor(cursor)
     result = await db.execute(
-        select(models.User)
+        select(models.User.updated_at)
         .where(models.User.id == user_id)
     )
-    user=result.scalars().first()
+    user_updated_at = result.scalar()
 
 
-    if not user:
+    if user_updated_at is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with ID {user_id} not found." 
         )
     
     results = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.user_id == user_id)
+        apply_keyset(
+            select_post_versions().where(models.Post.user_id == user_id),
+            position,
+            limit,
+        )
     )
-    posts = results.scalars().all()
-    return posts
+    page = build_page(results.all(), position, limit)
+    if links := link_header(request, page, limit):
+        response.headers["Link"] = links
+
+    etag = make_etag("user_posts", view, user_id, user_updated_at, [tuple(row) for row in page.items])
+    if (not_modified := conditional_response(request, response, etag)) is not None:
+        return not_modified
 
-@router.patch("/{user_id}", response_model=UserPrivate)
+    ids = [row.id for row in page.items]
+    if view == "summary":
+        return json_response(
+            post_summary_list_adapter, await load_post_rows(db, ids, summary=True), response
+        )
+    return json_response(post_list_adapter, await load_post_rows(db, ids), response)
+
+@router.patch("/{user_id}", response_model=UserPrivate, dependencies=[Depends(update_user_limit)])
 async def update_user(
     user_id: int, 
     current_user: CurrentUser,
@@ -164,74 +253,87 @@ async def update_user(
             detail="You do not have permission to update this user."
         )
     
-    result = await db.execute(
-        select(models.User)
-        .where(models.User.id == user_id)
-    ) 
-    user = result.scalars().first()
+    values = {}
+    if user_update_data.username is not None: values["username"] = user_update_data.username.lower()
+    if user_update_data.email is not None: values["email"] = user_update_data.email.lower()
+    if user_update_data.image_file is not None: values["image_file"] = user_update_data.image_file
+    if not values:
+        return current_user
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with ID {user_id} not found."
-        )
-    
-    if user_update_data.username is not None and user_update_data.username.lower() != user.username.lower():
+    # One UPDATE ... RETURNING; the unique lower() indexes reject a taken
+    # username or email, and only then do we look up which one it was
+    try:
         result = await db.execute(
-            select(models.User)
-            .where(func.lower(models.User.username) == user_update_data.username.lower())
-        )
-        existing_user = result.scalars().first()
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"User with that {user_update_data.username} already exists."
+            update(models.User)
+            .where(models.User.id == user_id)
+            .values(**values)
+            .returning(
+                models.User.id,
+                models.User.username,
+                models.User.email,
+                models.User.image_file,
             )
-    if user_update_data.email is not None and user_update_data.email.lower() != user.email.lower():
-        result = await db.execute(
-            select(models.User)
-            .where(func.lower(models.User.email) == user_update_data.email.lower())
+            .execution_options(synchronize_session=False)
         )
-        existing_user = result.scalars().first()
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"User with that {user_update_data.email} already exists."
-            )
-    
-    if user_update_data.username is not None: user.username = user_update_data.username.lower()
-    if user_update_data.email is not None: user.email = user_update_data.email.lower()
-    if user_update_data.image_file is not None: user.image_file = user_update_data.image_file
+    except IntegrityError:
+        await db.rollback()
+        taken = await find_taken_identity(
+            db,
+            user_update_data.username,
+            user_update_data.email,
+            exclude_user_id=user_id,
+        )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"User with that {taken or 'username or email'} already exists."
+        )
+    row = result.first()
+
+    if row is None:
+        # current_user came from the cache and was deleted by another worker
+        reject_deleted_user(user_id)
 
     await db.commit()
-    await db.refresh(user)
-    return user
+    invalidate_cached_user(user_id)
+    page_cache.invalidate("feed", f"user:{user_id}")
+    return {**row._mapping, "image_path": models.profile_image_path(row.image_file)}
 
-@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete(
+    "/{user_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses={status.HTTP_202_ACCEPTED: {"description": "Purge started in the background."}},
+)
 async def delete_user(
     user_id:int, 
     current_user: CurrentUser,
-    db: DB
+    db: DB,
+    background: bool = Query(
+        False,
+        description="Delete the user's posts in small batches in the background and "
+                    "return 202 right away; the account goes once its posts are gone.",
+    ),
 ):
-    if user.id != current_user.id:
+    if user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You do not have permission to delete this user."
         )
 
+    if background:
+        # A retry while the purge is still queued or running gets the same 202
+        if enqueue(db, "purge_user", user_id=user_id):
+            await db.commit()
+        return Response(status_code=status.HTTP_202_ACCEPTED)
+
+    # Posts go with the user through ON DELETE CASCADE
     result = await db.execute(
-        select(models.User)
+        delete(models.User)
         .where(models.User.id == user_id)
+        .returning(models.User.id)
+        .execution_options(synchronize_session=False)
     )
-    user = result.scalars().first() 
-
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with ID {user_id} not found."
-        )
-    await db.delete(user)
+    if result.first() is None:
+        reject_deleted_user(user_id)
     await db.commit()
-
-
-
+    invalidate_cached_user(user_id)
+    page_cache.invalidate("feed", f"user:{user_id}")
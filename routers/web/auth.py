@@ -1,13 +1,12 @@
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
+
+from core.templating import templates
 
 router = APIRouter(
     include_in_schema=False,
     tags=["Web Auth"]
 )
 
-templates = Jinja2Templates(directory="templates")
-
 
 @router.get("/login", include_in_schema=False, name="login")
 async def login_page(request: Request):
@@ -1,11 +1,15 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import models
-from database import get_db
+from config import settings
+from core.cache import page_cache
+from core.pagination import LimitParam
+from core.search import SearchPageParam, build_match_query, search_page_url, search_posts
+from core.templating import templates
+from database import get_read_db
 from schemas import PostResponse
 
 
@@ -14,11 +18,41 @@ router = APIRouter(
     tags=["Web"]
 )
 
-templates = Jinja2Templates(directory="templates")
+
+@router.get("/search", include_in_schema=False, name="search")
+async def search_page(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    q: Annotated[str, Query(max_length=200)] = "",
+    page: SearchPageParam = 1,
+    limit: LimitParam = settings.page_size,
+):
+    if (cached := page_cache.get(request)) is not None:
+        return cached
+
+    hits, has_next = [], False
+    if build_match_query(q) is not None:
+        hits, has_next = await search_posts(db, q, page, limit)
+    response = templates.TemplateResponse(
+        "search.html",
+        {
+            "request": request,
+            "query": q,
+            "hits": hits,
+            "next_url": search_page_url(request, page + 1 if has_next else None, limit),
+            "prev_url": search_page_url(request, page - 1 if page > 1 else None, limit),
+        }
+    )
+    # Every post or user write invalidates "feed", which covers results too
+    page_cache.store(request, response, tags=["feed"])
+    return response
 
 
 @router.get("/{post_id}", response_model=PostResponse, include_in_schema=False, name="post_detail")
-async def post_detail(request: Request, post_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
+async def post_detail(request: Request, post_id: int, db: Annotated[AsyncSession, Depends(get_read_db)]):
+    if (cached := page_cache.get(request)) is not None:
+        return cached
+
     result = await db.execute(
         select(models.Post)
         .options(selectinload(models.Post.author))
@@ -26,13 +60,15 @@ async def post_detail(request: Request, post_id: int, db: Annotated[AsyncSession
     post = result.scalars().first()
 
     if post:
-        return templates.TemplateResponse(
+        response = templates.TemplateResponse(
             "post_detail.html",
             {
                 "request": request,
                 "post": post
             }
         )
+        page_cache.store(request, response, tags=[f"post:{post.id}", f"user:{post.user_id}"])
+        return response
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND,
         detail=f"Sorry, the post with ID {post_id} does not exist."
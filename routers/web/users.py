@@ -1,21 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from fastapi.templating import Jinja2Templates
 from typing import Annotated
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 import models
-from database import get_db 
+from config import settings
+from core.cache import page_cache
+from core.pagination import (
+    CursorParam,
+    LimitParam,
+    apply_keyset,
+    build_page,
+    decode_cursor,
+    page_url,
+    without_content,
+)
+from core.templating import templates
+from database import get_read_db 
 
 router = APIRouter(
     prefix="/users",
     tags=["Web"]
 )
 
-templates = Jinja2Templates(directory="templates")
-
 @router.get("/{user_id}/posts", include_in_schema=False, name="user_posts")
-async def user_posts_page(request: Request, user_id: int, db: Annotated[AsyncSession, Depends(get_db)]):
+async def user_posts_page(
+    request: Request,
+    user_id: int,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    cursor: CursorParam = None,
+    limit: LimitParam = settings.page_size,
+):
+    if (cached := page_cache.get(request)) is not None:
+        return cached
+
+    position = decode_cursor(cursor)
     result = await db.execute(
         select(models.User)
         .where(models.User.id == user_id)
@@ -29,19 +48,26 @@ async def user_posts_page(request: Request, user_id: int, db: Annotated[AsyncSes
         )
     
     results = await db.execute(
-        select(models.Post)
-        .options(selectinload(models.Post.author))
-        .where(models.Post.user_id == user_id)
-        .order_by(models.Post.date_posted.desc())
+        apply_keyset(
+            select(models.Post)
+            .options(selectinload(models.Post.author), without_content)
+            .where(models.Post.user_id == user_id),
+            position,
+            limit,
+        )
     )
-    posts = results.scalars().all()
+    page = build_page(results.scalars().all(), position, limit)
 
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "user_posts.html",
         {
             "request": request,
-            "posts": posts,
+            "posts": page.items,
+            "next_url": page_url(request, page.next_cursor, limit),
+            "prev_url": page_url(request, page.prev_cursor, limit),
             "user": user,
             "title": f"Posts by {user.username}"
         }
-    )
\ No newline at end of file
+    )
+    page_cache.store(request, response, tags=[f"user:{user.id}"])
+    return response
@@ -1,5 +1,5 @@
-from datetime import datetime
-from pydantic import BaseModel, ConfigDict, Field, EmailStr
+from datetime import UTC, datetime
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, field_validator
 
 # Users Schemas
 class UserBase(BaseModel):
@@ -52,3 +52,51 @@ class PostResponse(PostBase):
     date_posted: datetime
     author: UserPublic
 
+
+class PostSummary(BaseModel):
+    """A post as listed in feeds: the excerpt instead of the full content."""
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str
+    excerpt: str
+    user_id: int
+    date_posted: datetime
+    author: UserPublic
+
+
+class PostEvent(BaseModel):
+    id: int
+    user_id: int
+    title: str | None = None
+    excerpt: str | None = None
+    date_posted: datetime | None = None
+
+    @field_validator("date_posted")
+    @classmethod
+    def as_utc(cls, value: datetime | None) -> datetime | None:
+        # SQLite hands back naive datetimes, e.g. from UPDATE ... RETURNING
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=UTC)
+        return value
+
+class PostBulkEvent(BaseModel):
+    user_id: int
+    ids: list[int]
+
+class BulkItemError(BaseModel):
+    index: int = Field(description="Position of the item in the array (or non-empty line in NDJSON).")
+    errors: list[dict]
+
+class BulkPostResult(BaseModel):
+    created: int
+    ids: list[int] = Field(description="Ids of the created posts, in input order.")
+    errors: list[BulkItemError]
+
+class PostSearchResult(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    post: PostResponse
+    rank: float
+    title: str = Field(description="Title with matches wrapped in <mark>, HTML-escaped.")
+    snippet: str = Field(description="Best matching fragment of the content, HTML-escaped.")